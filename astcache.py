@@ -0,0 +1,140 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# On-disk cache of parsed programs, so parse_program (brewparse.py) can skip lexing and parsing a program it has
+# already seen (even in an earlier run of the interpreter).
+#
+# Every entry is a file named after a sha256 of the grammar signature + the program's source, holding the AST
+# as nested tuples/lists (Element -> (elem_type, dict)) run through marshal and zlib. A different grammar (or
+# python version, marshal's format can change) just means different file names, old ones get evicted eventually.
+#
+# The directory is $BREWIN_AST_CACHE if it's set (empty turns the cache off), otherwise ~/.cache/brewin/ast
+# (or $XDG_CACHE_HOME/brewin/ast). It never goes in the source tree.
+#
+# LRU: a hit bumps the file's mtime, and every write deletes the oldest files past size entries.
+# Several processes can share the directory: files get written to a temp file (unique per writer) first and
+# os.replace()d into place, so nobody ever reads half a file. A file that disappears or can't be read (evicted by
+# someone else, corrupted) is just a miss. The cache is best effort, nothing here ever makes parsing fail.
+
+import hashlib
+import marshal
+import os
+import sys
+import time
+import zlib
+
+from element import Element
+
+# bump if the way ASTs get stored changes
+FORMAT = 1
+DEFAULT_SIZE = 512
+# temp files older than this are from writers that died, eviction cleans them up
+STALE_TEMP_SECONDS = 3600
+
+
+def default_directory():
+    directory = os.environ.get("BREWIN_AST_CACHE")
+    if directory is not None:
+        return directory or None
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "brewin", "ast")
+
+
+class ASTCache:
+    # get_signature is only called once something actually uses the cache
+    def __init__(self, directory, get_signature, size=DEFAULT_SIZE):
+        self.directory = directory
+        self.get_signature = get_signature
+        self.size = size
+        self.signature = None
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, program):
+        if self.signature is None:
+            self.signature = f"{FORMAT}:{sys.version_info[0]}.{sys.version_info[1]}:{self.get_signature()}".encode()
+        digest = hashlib.sha256(self.signature + b"\0" + program.encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".ast")
+
+    # the program's AST, or None if it isn't cached
+    def get(self, program):
+        if self.directory is None:
+            return None
+        path = self.path(program)
+        try:
+            with open(path, "rb") as file:
+                ast = decode(marshal.loads(zlib.decompress(file.read())))
+        except (OSError, ValueError, EOFError, TypeError, IndexError, zlib.error):
+            self.misses += 1
+            return None
+        # recently used, so it's the last to get evicted
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return ast
+
+    def put(self, program, ast):
+        if self.directory is None:
+            return
+        path = self.path(program)
+        data = zlib.compress(marshal.dumps(encode(ast)))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # unique per writer (importing tempfile for mkstemp costs more than the rest of the module)
+            temp_path = os.path.join(self.directory, f".{os.getpid()}.{os.urandom(8).hex()}.tmp")
+            try:
+                with open(temp_path, "xb") as file:
+                    file.write(data)
+                os.replace(temp_path, path)
+            finally:
+                # only still there if something went wrong
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self.evict()
+        except OSError:
+            pass
+
+    # deletes the least recently used entries past size (and temp files nobody is going to finish)
+    def evict(self):
+        entries = []
+        now = time.time()
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                try:
+                    if entry.name.endswith(".ast"):
+                        entries.append((entry.stat().st_mtime_ns, entry.path))
+                    elif entry.name.endswith(".tmp") and now - entry.stat().st_mtime > STALE_TEMP_SECONDS:
+                        os.remove(entry.path)
+                except OSError:
+                    # someone else got to it first
+                    pass
+        if len(entries) <= self.size:
+            return
+        entries.sort()
+        for mtime, path in entries[:len(entries) - self.size]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# Element -> (elem_type, dict), so the tree is only tuples/lists/dicts/strs/ints/bools/None (a parsed AST never
+# has tuples of its own)
+def encode(value):
+    if isinstance(value, Element):
+        return (value.elem_type, {key: encode(item) for key, item in value.dict.items()})
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    return value
+
+
+def decode(value):
+    if type(value) is tuple:
+        node = Element(value[0])
+        node.dict = {key: decode(item) for key, item in value[1].items()}
+        return node
+    if type(value) is list:
+        return [decode(item) for item in value]
+    return value
@@ -1,5 +1,5 @@
 
-from ply import lex
+import re
 
 reserved = (
     "VAR",
@@ -50,87 +50,103 @@ tokens = reserved + (
     "DOT",
 )
 
-t_ignore = " \t"
-
-literals = [
-    "=",
-    "+",
-    "-",
-    "*",
-    "/",
-    "(",
-    ")",
-    ",",
-    "{",
-    "}",
-    ";",
-    ">",
-    "<",
-    '"',
-    ".",
-    "!",
-    "@",
-]
-
 # Tokens
-
-t_LPAREN = r"\("
-t_RPAREN = r"\)"
-t_LBRACE = r"\{"
-t_RBRACE = r"\}"
-t_COMMA = r","
-t_COLON = r":"
-t_SEMI = r";"
-t_EQ = r"=="
-t_GREATER_EQ = r">="
-t_GREATER = r">"
-t_LESS_EQ = r"<="
-t_LESS = r"<"
-t_NOT_EQ = r"!="
-t_ASSIGN = r"="
-t_PLUS = r"\+"
-t_MINUS = r"\-"
-t_MULTIPLY = r"\*"
-t_DIVIDE = r"/"
-t_AND = r"&&"
-t_OR = r"\|\|"
-t_NOT = r"!"
-t_DOT = r"."
-
-
-def t_NUMBER(t):
-    r"\d+"
-    t.value = int(t.value)
-    return t
-
-
-def t_NAME(t):
-    r"[A-Za-z_][\w_]*"
-    t.type = reserved_map.get(t.value, "NAME")
-    return t
-
-def t_newline(t):
-    r"\n+"
-    t.lexer.lineno += t.value.count("\n")
-
-
-def t_comment(t):
-    r"/\*(.|\n)*?\*/"
-    t.lexer.lineno += t.value.count("\n")
-
-
-def t_STRING(t):
-    r'".*?"'
-    t.value = t.value[1:-1]
-    return t
-
-
-def t_error(t):
-    print(f"Illegal character {t.value[0]}")
-    t.lexer.skip(1)
-
-def reset_lineno():
-    lexer.lineno = 1
-
-# Build the lexer
-lexer = lex.lex()
+#
+# One regex for every token, scanned with finditer (spaces/tabs before a token get skipped). It matches what ply.lex
+# matched: each alternative starts with different characters than the others, so which one matches doesn't depend
+# on their order (they're in order of how common they are), except for OTHER, which takes any character nothing
+# else did and has to stay last. Inside OP the two character operators come before the one character ones.
+# Anything that isn't an operator is a DOT (like ply, where t_DOT was the regex "."), so no character is illegal.
+# (OTHER can't be a space or tab, otherwise trailing whitespace would backtrack into one.)
+TOKEN_REGEX = re.compile(r"""[ \t]*(?:
+    (?P<NAME>[A-Za-z_][\w_]*)
+  | (?P<OP>[(){};,:+\-*] | \|\| | == | >= | <= | != | && | [<>=!])
+  | (?P<newline>\n+)
+  | (?P<NUMBER>\d+)
+  | (?P<STRING>".*?")
+  | (?P<comment>/\*(?:.|\n)*?\*/)
+  | (?P<OTHER>[^ \t\n])
+)""", re.VERBOSE)
+
+# operator text -> token type (anything else OTHER matches is a DOT)
+OPERATORS = {
+    "(": "LPAREN",
+    ")": "RPAREN",
+    "{": "LBRACE",
+    "}": "RBRACE",
+    ",": "COMMA",
+    ":": "COLON",
+    ";": "SEMI",
+    "==": "EQ",
+    "!=": "NOT_EQ",
+    ">=": "GREATER_EQ",
+    ">": "GREATER",
+    "<=": "LESS_EQ",
+    "<": "LESS",
+    "=": "ASSIGN",
+    "+": "PLUS",
+    "-": "MINUS",
+    "*": "MULTIPLY",
+    "/": "DIVIDE",
+    "&&": "AND",
+    "||": "OR",
+    "!": "NOT",
+}
+
+
+# the program's tokens as (type, value, line) tuples, one at a time
+def tokenize(program):
+    operator_type = OPERATORS.get
+    name_type = reserved_map.get
+    line = 1
+    for match in TOKEN_REGEX.finditer(program):
+        kind = match.lastgroup
+        value = match[kind]
+        if kind == "NAME":
+            yield (name_type(value, "NAME"), value, line)
+        elif kind == "OP":
+            yield (OPERATORS[value], value, line)
+        elif kind == "newline":
+            line += len(value)
+        elif kind == "NUMBER":
+            yield (kind, int(value), line)
+        elif kind == "STRING":
+            yield (kind, value[1:-1], line)
+        elif kind == "comment":
+            line += value.count("\n")
+        else:
+            yield (operator_type(value, "DOT"), value, line)
+
+
+# all of them in a list
+def scan(program):
+    return list(tokenize(program))
+
+
+# what ply's parser gets from TokenStream.token() (it wants objects, and sets .lexer on the one it errors at)
+class Token:
+    __slots__ = ("type", "value", "lineno", "lexer")
+
+    def __init__(self, token_type, value, lineno):
+        self.type = token_type
+        self.value = value
+        self.lineno = lineno
+
+    def __repr__(self):
+        return f"Token({self.type}, {self.value!r}, {self.lineno})"
+
+
+# Stands in for a ply lexer, for ply's parser (every BrewinParser in brewparse.py has its own): token() gives back
+# the next token (None at the end). Like ply.lex it only scans as far as the parser has asked for, so something like
+# int() of a number with too many digits only gets raised once parsing gets there.
+class TokenStream:
+    def __init__(self):
+        self.tokens = iter(())
+
+    def input(self, program):
+        self.tokens = tokenize(program)
+
+    def token(self):
+        for token_type, value, line in self.tokens:
+            return Token(token_type, value, line)
+        return None
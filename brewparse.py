@@ -1,6 +1,13 @@
+import marshal
+import os
+import sys
+import threading
+
 from element import Element
 from brewlex import *
 from intbase import InterpreterBase
+from astcache import ASTCache, default_directory
+from rdparse import DescentParser
 from ply import yacc
 
 # Parsing rules
@@ -254,6 +261,7 @@ def p_expression_args(p):
     collapse_items(p, 1, 3)
 
 
+# prints a syntax error (BrewinParser counts them)
 def p_error(p):
     if p:
         print(f"Syntax error at '{p.value}' on line {p.lineno}")
@@ -261,14 +269,112 @@ def p_error(p):
         print("Syntax error at EOF")
 
 
-# exported function
-def parse_program(program):
-    reset_lineno()
-    ast = yacc.parse(program)
-    if ast is None:
-        raise SyntaxError("Syntax error")
-    return ast
-
+# changes whenever the tokens, the grammar or what the rules build changes, so cached ASTs from
+# an older version of this file (or brewlex.py) don't get used
+def grammar_signature():
+    parts = [repr(precedence), repr(tokens), repr(reserved_map), repr(OPERATORS), TOKEN_REGEX.pattern,
+             marshal.dumps(tokenize.__code__).hex()]
+    for name, value in sorted(globals().items()):
+        if name.startswith("p_"):
+            parts.append(f"{name}:{value.__doc__}:{marshal.dumps(value.__code__).hex()}")
+    return "\n".join(parts)
+
+
+# parsed programs get cached on disk (see astcache.py)
+AST_CACHE = ASTCache(default_directory(), grammar_signature)
+
+
+PARSERS = ("ply", "descent")
+
+
+# A parser with all of its own state: its own lexer (TokenStream), its own ply LRParser (which keeps its stacks
+# and error state on itself while it parses) and its own DescentParser, plus its own syntax error count. The only
+# things shared between instances are the LALR tables and the rule functions, and parsing never changes those.
+# So different BrewinParsers can parse at the same time in different threads (one instance still only parses one
+# program at a time, so give every thread its own and reuse it).
+class BrewinParser:
+    # parser picks what parses it: "ply" (the LALR parser for the rules above) or "descent" (hand-written, faster,
+    # see rdparse.py). both give back the same AST and print the same syntax errors
+    def __init__(self, parser="ply", cache=AST_CACHE):
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser: {parser}")
+        self.parser = parser
+        self.cache = cache
+        # how many syntax errors this parser has printed (a parse that printed errors doesn't get cached)
+        self.syntax_errors = 0
+        self.lexer = TokenStream()
+        self.descent_parser = DescentParser(self.error)
+        # made the first time it's needed, same as the tables
+        self.lalr_parser = None
+
+    def error(self, p):
+        self.syntax_errors += 1
+        p_error(p)
+
+    def parse(self, program):
+        ast = self.cache.get(program)
+        if ast is not None:
+            return ast
+        errors = self.syntax_errors
+        if self.parser == "descent":
+            ast = self.descent_parser.parse(program)
+        else:
+            if self.lalr_parser is None:
+                self.lalr_parser = yacc.LRParser(get_tables(), self.error)
+            ast = self.lalr_parser.parse(program, lexer=self.lexer)
+        if ast is None:
+            raise SyntaxError("Syntax error")
+        # the cache would skip printing the errors next time
+        if self.syntax_errors == errors:
+            self.cache.put(program, ast)
+        return ast
+
+
+# one BrewinParser per thread per kind of parser for parse_program, so it's fine to call from several threads at
+# once (a new one every call would be safe too, but making ply's LRParser costs more than parsing a small program)
+default_parsers = threading.local()
 
-# generate our parser
-yacc.yacc() # yacc.yacc(debug=True, debuglog=open("parse.log", "w"))
+# exported function
+def parse_program(program, parser="ply"):
+    parsers = getattr(default_parsers, "parsers", None)
+    if parsers is None:
+        parsers = default_parsers.parsers = {}
+    if parser not in parsers:
+        parsers[parser] = BrewinParser(parser)
+    return parsers[parser].parse(program)
+
+
+# the LALR tables only get loaded the first time something actually needs parsing with ply (a cached AST doesn't),
+# straight from parsetab.py. yacc.yacc() would reflect over this whole module and check the tables against the
+# grammar on every import, and rewrite parsetab.py/parser.out if they didn't match.
+# so after changing the grammar, run `python brewparse.py` to regenerate parsetab.py
+# (two threads might both load them the first time, that's fine, they get the same tables and one of them wins)
+lalr_tables = None
+
+def get_tables():
+    global lalr_tables
+    if lalr_tables is None:
+        lalr_tables = load_tables()
+    return lalr_tables
+
+def load_tables():
+    try:
+        import parsetab
+        tables = yacc.LRTable()
+        tables.read_table(parsetab)
+        # a rule that got renamed/removed since parsetab.py was generated
+        tables.bind_callables(globals())
+        return tables
+    except (ImportError, yacc.VersionError, KeyError):
+        # no usable tables, generate them in memory (without writing anything). LRParser only needs these three
+        generated = yacc.yacc(module=sys.modules[__name__], write_tables=False, debug=False)
+        tables = yacc.LRTable()
+        tables.lr_productions = generated.productions
+        tables.lr_action = generated.action
+        tables.lr_goto = generated.goto
+        return tables
+
+
+# regenerates parsetab.py (and parser.out, for debugging the grammar)
+if __name__ == "__main__":
+    yacc.yacc(module=sys.modules[__name__], debug=True, outputdir=os.path.dirname(os.path.abspath(__file__)))
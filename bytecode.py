@@ -0,0 +1,477 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Bytecode compiler + VM for Brewin programs.
+# Every func is compiled into a flat array of (opcode, arg) int pairs with its own constant pool.
+# Variables are frame slots (see resolver.py), so *_FAST ops just index into the frame list.
+# The VM runs everything in ONE loop: calls push a frame onto the VM's own frame stack instead of recursing in python,
+# so deep Brewin recursion doesn't blow up the python stack.
+#
+# Output/errors/scoping must match the tree walker (interpreterv2), including its return quirks:
+#   - a statement that produces a non-nil value (a `return x` or even a bare call like `f();`) ends the function
+#   - `return;` ends the function with nil
+
+from array import array
+from intbase import InterpreterBase, ErrorType
+from inliner import INLINE_NODE
+from licm import HOISTED_NODE
+
+### OPCODES ###
+# ordered roughly by how often they run, the VM checks them in this order.
+LOAD_FAST = 0           # arg: slot. push value of variable
+LOAD_CONST = 1          # arg: const index
+STORE_FAST = 2          # arg: slot. pop value into variable
+DEFINE_FAST = 3         # arg: slot. (re)declare variable, it's undefined until assigned
+ADD = 4
+SUB = 5
+MUL = 6
+DIV = 7
+LT = 8
+LE = 9
+GT = 10
+GE = 11
+EQ = 12
+NE = 13
+AND = 14
+OR = 15
+NEG = 16
+NOT = 17
+JUMP = 18               # arg: target
+JUMP_IF_FALSE = 19      # arg: target. pop condition, must be bool (if statements and for loops)
+CALL = 20               # arg: func index. args are on the stack
+RETURN_IF_NOT_NIL = 21  # pop value, return it if it isn't nil
+RETURN_NIL = 22
+PRINT_BOOL = 23         # arg: target. pop value, if bool push "true"/"false" and jump
+TO_STR = 24
+PRINT = 25              # arg: number of strings to pop and print
+OUTPUT = 26             # pop value and output it (inputi/inputs prompt)
+INPUT = 27
+RAISE = 28              # arg: const index of (ErrorType, message)
+TAIL_CALL = 29          # arg: func index. like CALL, but the callee takes over the current frame (see tailcalls.py)
+
+OPNAMES = [
+    "LOAD_FAST", "LOAD_CONST", "STORE_FAST", "DEFINE_FAST",
+    "ADD", "SUB", "MUL", "DIV",
+    "LT", "LE", "GT", "GE", "EQ", "NE", "AND", "OR", "NEG", "NOT",
+    "JUMP", "JUMP_IF_FALSE",
+    "CALL", "RETURN_IF_NOT_NIL", "RETURN_NIL",
+    "PRINT_BOOL", "TO_STR", "PRINT", "OUTPUT", "INPUT", "RAISE", "TAIL_CALL",
+]
+
+# ops that use their arg, and what it refers to (for the disassembler)
+SLOT_ARGS = (LOAD_FAST, STORE_FAST, DEFINE_FAST)
+CONST_ARGS = (LOAD_CONST, RAISE)
+JUMP_ARGS = (JUMP, JUMP_IF_FALSE, PRINT_BOOL)
+
+BINARY_OPS = {
+    "+": ADD, "-": SUB, "*": MUL, "/": DIV,
+    "<": LT, "<=": LE, ">": GT, ">=": GE, "==": EQ, "!=": NE,
+    "&&": AND, "||": OR,
+}
+
+
+# compiled version of one func
+class CodeObject:
+    def __init__(self, name, params, frame_size):
+        self.name = name
+        self.params = params            # param names, in order (they're slots 0..n-1)
+        self.frame_size = frame_size    # slots a call needs (from resolver.py)
+        self.code = array('i')          # opcode, arg, opcode, arg, ...
+        self.consts = []                # constant pool
+        # instruction position -> variable name, for *_FAST ops.
+        # only looked at for error messages and the disassembler
+        self.slot_names = {}
+        self.const_index = {}
+
+    def add_const(self, value):
+        # key includes the type so 1 and true don't share a slot
+        key = (type(value), value) if value is None or isinstance(value, (int, str, bool)) else (type(value), id(value))
+        if key not in self.const_index:
+            self.const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return self.const_index[key]
+
+    # returns position of the emitted instruction (in instructions, not ints)
+    def emit(self, op, arg=0):
+        self.code.append(op)
+        self.code.append(arg)
+        return len(self.code) // 2 - 1
+
+    def emit_fast(self, op, slot, name):
+        position = self.emit(op, slot)
+        self.slot_names[position] = name
+        return position
+
+    def here(self):
+        return len(self.code) // 2
+
+    def patch(self, position, target):
+        self.code[position * 2 + 1] = target
+
+
+class BytecodeCompiler:
+    def __init__(self, interpreter, nil):
+        self.interp = interpreter
+        self.nil = nil
+        self.func_index = {}    # id(func node) -> index into program
+        self.program = []
+
+    def compile_program(self, func_defs):
+        for func in func_defs:
+            self.func_index[id(func)] = len(self.program)
+            params = [arg.dict['name'] for arg in func.dict['args']]
+            self.program.append(CodeObject(func.dict['name'], params, func.dict['frame_size']))
+        for func in func_defs:
+            self.compile_func(func, self.program[self.func_index[id(func)]])
+        return self.program
+
+    def compile_func(self, func_node, code):
+        self.compile_block(func_node.dict['statements'], code)
+        code.emit(RETURN_NIL)
+
+    def compile_block(self, statements, code):
+        for statement in statements or ():
+            self.compile_statement(statement, code)
+
+    ### STATEMENTS ###
+
+    def compile_statement(self, statement_node, code):
+        kind = statement_node.elem_type
+        if kind == InterpreterBase.VAR_DEF_NODE:
+            var_name = statement_node.dict['name']
+            if statement_node.dict['slot'] is None:
+                self.emit_error(code, ErrorType.NAME_ERROR, f"Variable {var_name} defined more than once")
+            else:
+                code.emit_fast(DEFINE_FAST, statement_node.dict['slot'], var_name)
+        elif kind == "=":
+            var_name = statement_node.dict['name']
+            # variable has to exist before the expression gets evaluated
+            if statement_node.dict['slot'] is None:
+                self.emit_error(code, ErrorType.NAME_ERROR, f"variable used and not declared: {var_name}")
+            else:
+                self.compile_expression(statement_node.dict['expression'], code)
+                code.emit_fast(STORE_FAST, statement_node.dict['slot'], var_name)
+        elif kind == InterpreterBase.FCALL_NODE:
+            # a call whose value isn't nil ends the function (tree walker behavior)
+            self.compile_func_call(statement_node, code)
+            code.emit(RETURN_IF_NOT_NIL)
+        elif kind == InterpreterBase.RETURN_NODE:
+            if not statement_node.dict['expression']:
+                code.emit(RETURN_NIL)
+            else:
+                self.compile_expression(statement_node.dict['expression'], code)
+                code.emit(RETURN_IF_NOT_NIL)
+        elif kind == InterpreterBase.IF_NODE:
+            self.compile_if_statement(statement_node, code)
+        elif kind == InterpreterBase.FOR_NODE:
+            self.compile_for_loop(statement_node, code)
+        # anything else is ignored by the tree walker, so nothing to emit
+
+    def compile_if_statement(self, statement_node, code):
+        self.compile_expression(statement_node.dict['condition'], code)
+        jump_to_else = code.emit(JUMP_IF_FALSE)
+        self.compile_block(statement_node.dict['statements'], code)
+        else_statements = statement_node.dict['else_statements']
+        if else_statements:
+            jump_to_end = code.emit(JUMP)
+            code.patch(jump_to_else, code.here())
+            self.compile_block(else_statements, code)
+            code.patch(jump_to_end, code.here())
+        else:
+            code.patch(jump_to_else, code.here())
+
+    def compile_for_loop(self, statement_node, code):
+        self.compile_statement(statement_node.dict['init'], code)
+        top = code.here()
+        # condition is evaluated exactly once per iteration, and has to be a bool
+        self.compile_expression(statement_node.dict['condition'], code)
+        jump_to_end = code.emit(JUMP_IF_FALSE)
+        self.compile_block(statement_node.dict['statements'], code)
+        self.compile_statement(statement_node.dict['update'], code)
+        code.emit(JUMP, top)
+        code.patch(jump_to_end, code.here())
+
+    ### FUNCTION CALLS ###
+
+    def compile_func_call(self, call_node, code):
+        func_call = call_node.dict['name']
+        args = call_node.dict['args']
+        if func_call == "print":
+            for arg in args:
+                self.compile_expression(arg, code)
+                skip = code.emit(PRINT_BOOL)
+                # tree walker evaluates non-bool args a second time, keep that.
+                self.compile_expression(arg, code)
+                code.emit(TO_STR)
+                code.patch(skip, code.here())
+            code.emit(PRINT, len(args))
+        elif func_call == "inputi" or func_call == "inputs":
+            if len(args) > 1:
+                self.emit_error(code, ErrorType.NAME_ERROR, f"No {func_call}() function found that takes > 1 parameter")
+                return
+            if len(args) == 1:
+                self.compile_expression(args[0], code)
+                code.emit(OUTPUT)
+            code.emit(INPUT)
+        else:
+            # functions can't change after parsing, so resolve the callee now (errors still happen at runtime)
+            if not self.interp.check_valid_func(func_call):
+                self.emit_error(code, ErrorType.NAME_ERROR, f"Function {func_call} was not found")
+                return
+            func_def = self.interp.func_table.get((func_call, len(args)))
+            if func_def is None:
+                self.emit_error(code, ErrorType.NAME_ERROR, f"Incorrect amount of arguments given: {len(args)} ")
+                return
+            for arg in args:
+                self.compile_expression(arg, code)
+            code.emit(TAIL_CALL if call_node.dict.get('tail_call') else CALL, self.func_index[id(func_def)])
+
+    def emit_error(self, code, error_type, message):
+        code.emit(RAISE, code.add_const((error_type, message)))
+
+    ### EXPRESSIONS ###
+
+    def compile_expression(self, expression_node, code):
+        kind = expression_node.elem_type
+        if kind in (InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE, InterpreterBase.BOOL_NODE):
+            code.emit(LOAD_CONST, code.add_const(expression_node.dict['val']))
+        elif kind == InterpreterBase.NIL_NODE:
+            code.emit(LOAD_CONST, code.add_const(self.nil))
+        elif kind == InterpreterBase.VAR_NODE:
+            var_name = expression_node.dict['name']
+            if expression_node.dict['slot'] is None:
+                self.emit_error(code, ErrorType.NAME_ERROR, f"variable '{var_name}' used and not declared")
+            else:
+                code.emit_fast(LOAD_FAST, expression_node.dict['slot'], var_name)
+        elif kind in BINARY_OPS:
+            self.compile_expression(expression_node.dict['op1'], code)
+            self.compile_expression(expression_node.dict['op2'], code)
+            code.emit(BINARY_OPS[kind])
+        elif kind == InterpreterBase.NEG_NODE:
+            self.compile_expression(expression_node.dict['op1'], code)
+            code.emit(NEG)
+        elif kind == InterpreterBase.NOT_NODE:
+            self.compile_expression(expression_node.dict['op1'], code)
+            code.emit(NOT)
+        elif kind == InterpreterBase.FCALL_NODE:
+            self.compile_func_call(expression_node, code)
+        elif kind == INLINE_NODE:
+            # inlined call (see inliner.py): args go into their slots in our frame, then the func's expression runs
+            for slot, param, arg in zip(expression_node.dict['slots'], expression_node.dict['params'],
+                                        expression_node.dict['args']):
+                self.compile_expression(arg, code)
+                code.emit_fast(STORE_FAST, slot, param)
+            self.compile_expression(expression_node.dict['expression'], code)
+        elif kind == HOISTED_NODE:
+            # loop-invariant expression (licm.py), this engine just computes it every time
+            self.compile_expression(expression_node.dict['expression'], code)
+        else:
+            # evaluate_expression returns None for anything it doesn't know
+            code.emit(LOAD_CONST, code.add_const(None))
+
+
+class VirtualMachine:
+    def __init__(self, interpreter, nil, program, max_depth=None):
+        self.interp = interpreter
+        self.nil = nil
+        self.program = program
+        self.max_depth = max_depth
+
+    def run(self, main_index):
+        interp = self.interp
+        nil = self.nil
+        program = self.program
+        error = interp.error
+        max_depth = self.max_depth
+
+        # saved caller state while a callee runs
+        frames = []
+        func = program[main_index]
+        code = func.code
+        consts = func.consts
+        stack = []
+        slots = [None] * func.frame_size
+        pc = 0
+
+        while True:
+            op = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+
+            if op == LOAD_FAST:
+                val = slots[arg]
+                if val is None:
+                    var_name = func.slot_names[pc // 2 - 1]
+                    error(ErrorType.NAME_ERROR, f"variable '{var_name}' declared but not defined",)
+                stack.append(val)
+            elif op == LOAD_CONST:
+                stack.append(consts[arg])
+            elif op == STORE_FAST:
+                slots[arg] = stack.pop()
+            elif op == DEFINE_FAST:
+                slots[arg] = None
+            elif op <= DIV:
+                eval2 = stack.pop()
+                eval1 = stack.pop()
+                if op == ADD:
+                    if not ((type(eval1) == int and type(eval2) == int) or (type(eval1) == str and type(eval2) == str)):
+                        error(ErrorType.TYPE_ERROR, "Types for + must be both of type int or string.",)
+                    stack.append(eval1 + eval2)
+                else:
+                    if not (type(eval1) == int and type(eval2) == int):
+                        error(ErrorType.TYPE_ERROR, "Arguments must be of type 'int'.",)
+                    if op == SUB:
+                        stack.append(eval1 - eval2)
+                    elif op == MUL:
+                        stack.append(eval1 * eval2)
+                    else:
+                        # integer division
+                        stack.append(eval1 // eval2)
+            elif op <= GE:
+                eval2 = stack.pop()
+                eval1 = stack.pop()
+                if not (type(eval1) == int and type(eval2) == int):
+                    error(ErrorType.TYPE_ERROR, f"Comparison args for {OPNAMES_SYMBOL[op]} must be of same type int.",)
+                if op == LT:
+                    stack.append(eval1 < eval2)
+                elif op == LE:
+                    stack.append(eval1 <= eval2)
+                elif op == GT:
+                    stack.append(eval1 > eval2)
+                else:
+                    stack.append(eval1 >= eval2)
+            elif op == EQ:
+                eval2 = stack.pop()
+                eval1 = stack.pop()
+                stack.append(type(eval1) == type(eval2) and eval1 == eval2)
+            elif op == NE:
+                eval2 = stack.pop()
+                eval1 = stack.pop()
+                stack.append(type(eval1) != type(eval2) or eval1 != eval2)
+            elif op == AND or op == OR:
+                # both sides were already evaluated (strict evaluation)
+                eval2 = stack.pop()
+                eval1 = stack.pop()
+                if (type(eval1) is not bool) or (type(eval2) is not bool):
+                    error(ErrorType.TYPE_ERROR, f"Comparison args for {OPNAMES_SYMBOL[op]} must be of same type bool.",)
+                stack.append((eval1 and eval2) if op == AND else (eval1 or eval2))
+            elif op == NEG:
+                eval = stack.pop()
+                if not (type(eval) == int):
+                    error(ErrorType.TYPE_ERROR, "'negation' can only be used on integer values.",)
+                stack.append(-eval)
+            elif op == NOT:
+                eval = stack.pop()
+                if not (type(eval) == bool):
+                    error(ErrorType.TYPE_ERROR, "'Not' can only be used on boolean values.",)
+                stack.append(not eval)
+            elif op == JUMP:
+                pc = arg * 2
+            elif op == JUMP_IF_FALSE:
+                condition = stack.pop()
+                if type(condition) is not bool:
+                    error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+                if not condition:
+                    pc = arg * 2
+            elif op == CALL:
+                if max_depth is not None and len(frames) >= max_depth:
+                    error(ErrorType.FAULT_ERROR, f"Maximum recursion depth of {max_depth} exceeded",)
+                callee = program[arg]
+                # callee gets a fresh frame with only its arguments in it
+                processed_args = [None] * callee.frame_size
+                arg_count = len(callee.params)
+                if arg_count:
+                    processed_args[:arg_count] = stack[-arg_count:]
+                    del stack[-arg_count:]
+                frames.append((func, pc, stack, slots))
+                func = callee
+                code = func.code
+                consts = func.consts
+                stack = []
+                slots = processed_args
+                pc = 0
+            elif op == RETURN_IF_NOT_NIL or op == RETURN_NIL:
+                if op == RETURN_NIL:
+                    return_value = nil
+                else:
+                    return_value = stack.pop()
+                    if return_value is nil:
+                        continue
+                if not frames:
+                    return return_value
+                func, pc, stack, slots = frames.pop()
+                code = func.code
+                consts = func.consts
+                stack.append(return_value)
+            elif op == PRINT_BOOL:
+                eval = stack.pop()
+                if type(eval) is bool:
+                    stack.append("true" if eval else "false")
+                    pc = arg * 2
+            elif op == TO_STR:
+                stack.append(str(stack.pop()))
+            elif op == PRINT:
+                output = ""
+                if arg:
+                    output = "".join(stack[-arg:])
+                    del stack[-arg:]
+                interp.output(output)
+                stack.append(nil)
+            elif op == OUTPUT:
+                interp.output(stack.pop())
+            elif op == INPUT:
+                user_in = interp.get_input()
+                try:
+                    user_in = int(user_in)
+                except:
+                    pass
+                stack.append(user_in)
+            elif op == RAISE:
+                error_type, message = consts[arg]
+                error(error_type, message,)
+            elif op == TAIL_CALL:
+                # the current function is done, callee takes over its frame (no new entry in frames)
+                callee = program[arg]
+                arg_count = len(callee.params)
+                arg_values = stack[-arg_count:] if arg_count else []
+                # params get overwritten, every other slot is always defined (set to None) before it's read
+                if len(slots) != callee.frame_size:
+                    slots = [None] * callee.frame_size
+                slots[:arg_count] = arg_values
+                func = callee
+                code = func.code
+                consts = func.consts
+                stack = []
+                pc = 0
+
+
+# operator symbols, for error messages
+OPNAMES_SYMBOL = {op: symbol for symbol, op in BINARY_OPS.items()}
+
+
+# returns a readable listing of a compiled program (list of CodeObjects, or a single one)
+def disassemble(program):
+    if isinstance(program, CodeObject):
+        program = [program]
+    lines = []
+    for index, func in enumerate(program):
+        lines.append(f"func {func.name}({', '.join(func.params)}) [#{index}]")
+        for position in range(len(func.code) // 2):
+            op = func.code[position * 2]
+            arg = func.code[position * 2 + 1]
+            line = f"  {position:4d} {OPNAMES[op]:<18}"
+            if op in SLOT_ARGS:
+                line += f" {arg} ({func.slot_names[position]})"
+            elif op in CONST_ARGS:
+                const = func.consts[arg]
+                # quote strings so "5" and 5 don't look the same
+                line += f" {arg} ({const!r})" if isinstance(const, (str, tuple)) else f" {arg} ({const})"
+            elif op in JUMP_ARGS:
+                line += f" -> {arg}"
+            elif op == CALL or op == TAIL_CALL:
+                line += f" {arg} ({program[arg].name})"
+            elif op == PRINT:
+                line += f" {arg}"
+            lines.append(line.rstrip())
+        lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,609 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Closure-compiling backend for the Interpreter.
+# Instead of re-walking the Element tree (and its chain of is_* checks) on every execution,
+# each node is compiled ONCE into a small python closure that already knows what kind of node it is.
+# Running a statement/expression is then just a single call to its closure.
+#
+# Behavior (output, errors, scoping and the odd return rules) must match the tree walker in interpreterv2 exactly,
+# so most of the code below mirrors the do_*/evaluate_* methods over there.
+#
+# Every closure takes L, the frame of the running call: a list indexed by the slots resolver.py assigned.
+
+from intbase import InterpreterBase, ErrorType
+from loops import counter_range
+from memo import MISSING, make_key
+from inliner import INLINE_NODE
+from licm import HOISTED_NODE
+
+# `return;` needs to stop the function, but the value it returns is nil (which normally means 'keep going').
+# So we use this marker to tell the blocks to stop, and the function body turns it back into nil.
+RETURN_NIL = object()
+# returned by a call in tail position (see tailcalls.py) instead of its value. The caller's frame
+# is done, so whoever called it reuses that frame to run pending_tail_call (see run_tail_calls).
+TAIL_CALL = object()
+
+
+class ClosureCompiler:
+    def __init__(self, interpreter, nil):
+        self.interp = interpreter
+        self.nil = nil
+        # func node -> [compiled body], filled in after every function is compiled (so calls can be recursive)
+        self.func_bodies = {}
+        # ([compiled body], frame_size, arg values) of the tail call waiting for a frame
+        self.pending_tail_call = None
+
+    # compiles every function, returns a dict of func node -> callable body
+    def compile_program(self, func_defs):
+        for func in func_defs:
+            self.func_bodies[id(func)] = [None]
+        for func in func_defs:
+            self.func_bodies[id(func)][0] = self.compile_func(func)
+        return self.func_bodies
+
+    def get_body(self, func_node):
+        return self.func_bodies[id(func_node)][0]
+
+    # runs main in a fresh frame
+    def run_main(self, func_node):
+        frame = [None] * func_node.dict['frame_size']
+        return_value = self.get_body(func_node)(frame)
+        if return_value is TAIL_CALL:
+            return_value = self.run_tail_calls(frame)
+        return return_value
+
+    # keeps running the pending tail call in the same frame until something actually returns
+    def run_tail_calls(self, frame):
+        return_value = TAIL_CALL
+        while return_value is TAIL_CALL:
+            body, frame_size, arg_values = self.pending_tail_call
+            self.pending_tail_call = None
+            # params get overwritten, every other slot is always defined (set to None) before it's read
+            if len(frame) != frame_size:
+                frame = [None] * frame_size
+            frame[:len(arg_values)] = arg_values
+            return_value = body[0](frame)
+        return return_value
+
+    # same as run_func: run statements, stop on anything that isn't nil.
+    def compile_func(self, func_node):
+        nil = self.nil
+        statements = self.compile_block(func_node.dict['statements'])
+
+        def run_func(L):
+            for statement in statements:
+                return_value = statement(L)
+                if return_value is not nil:
+                    if return_value is RETURN_NIL:
+                        return nil
+                    return return_value
+            return nil
+        return run_func
+
+    def compile_block(self, statements):
+        if not statements:
+            return ()
+        return tuple(self.compile_statement(statement) for statement in statements)
+
+    ### STATEMENTS ###
+
+    def compile_statement(self, statement_node):
+        kind = statement_node.elem_type
+        if kind == InterpreterBase.VAR_DEF_NODE:
+            return self.compile_definition(statement_node)
+        if kind == "=":
+            return self.compile_assignment(statement_node)
+        if kind == InterpreterBase.FCALL_NODE:
+            return self.compile_func_call(statement_node)
+        if kind == InterpreterBase.RETURN_NODE:
+            return self.compile_return_statement(statement_node)
+        if kind == InterpreterBase.IF_NODE:
+            return self.compile_if_statement(statement_node)
+        if kind == InterpreterBase.FOR_NODE:
+            return self.compile_for_loop(statement_node)
+        # tree walker ignores any other statement (ex: a bare expression), so do nothing.
+        nil = self.nil
+        return lambda L: nil
+
+    def compile_definition(self, statement_node):
+        interp = self.interp
+        nil = self.nil
+        var_name = statement_node.dict['name']
+        slot = statement_node.dict['slot']
+        if slot is None:
+            def defined_twice(L):
+                interp.error(ErrorType.NAME_ERROR, f"Variable {var_name} defined more than once",)
+            return defined_twice
+
+        def do_definition(L):
+            L[slot] = None
+            return nil
+        return do_definition
+
+    def compile_assignment(self, statement_node):
+        interp = self.interp
+        nil = self.nil
+        var_name = statement_node.dict['name']
+        slot = statement_node.dict['slot']
+        expression = self.compile_expression(statement_node.dict['expression'])
+        if slot is None:
+            # Does not evaluate until after checking if valid variable
+            def not_declared(L):
+                interp.error(ErrorType.NAME_ERROR, f"variable used and not declared: {var_name}",)
+            return not_declared
+
+        def do_assignment(L):
+            L[slot] = expression(L)
+            return nil
+        return do_assignment
+
+    def compile_return_statement(self, statement_node):
+        if not statement_node.dict['expression']:
+            return lambda L: RETURN_NIL
+        # return value is the raw value (nil value means keep going, same as tree walker)
+        return self.compile_expression(statement_node.dict['expression'])
+
+    def compile_if_statement(self, statement_node):
+        interp = self.interp
+        nil = self.nil
+        condition = self.compile_expression(statement_node.dict['condition'])
+        statements = self.compile_block(statement_node.dict['statements'])
+        else_statements = self.compile_block(statement_node.dict['else_statements'])
+
+        def do_if_statement(L):
+            result = condition(L)
+            if type(result) is not bool:
+                interp.error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+            for statement in (statements if result else else_statements):
+                return_value = statement(L)
+                if return_value is not nil:
+                    return return_value
+            return nil
+        return do_if_statement
+
+    def compile_for_loop(self, statement_node):
+        interp = self.interp
+        nil = self.nil
+        init = self.compile_statement(statement_node.dict['init'])
+        condition = self.compile_expression(statement_node.dict['condition'])
+        update = self.compile_statement(statement_node.dict['update'])
+        statements = self.compile_block(statement_node.dict['statements'])
+        counter = statement_node.dict.get('counter')
+        if counter is not None:
+            loop = self.compile_counting_loop(statement_node, counter, init, condition, update, statements)
+            return self.compile_loop_temps(statement_node, loop)
+
+        def do_for_loop(L):
+            init(L)
+            while True:
+                # condition is evaluated exactly once per iteration, and has to be a bool
+                result = condition(L)
+                if type(result) is not bool:
+                    interp.error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+                if not result:
+                    return nil
+                for statement in statements:
+                    return_value = statement(L)
+                    if return_value is not nil:
+                        return return_value
+                update(L)
+        return self.compile_loop_temps(statement_node, do_for_loop)
+
+    # hoisted expressions (licm.py) get computed again every time the loop starts
+    def compile_loop_temps(self, statement_node, loop):
+        temps = statement_node.dict.get('temps')
+        if temps is None:
+            return loop
+
+        def do_loop_with_temps(L):
+            for slot in temps:
+                L[slot] = None
+            return loop(L)
+        return do_loop_with_temps
+
+    # for (i = a; i < b; i = i + k) loops marked by loops.py: i runs over a python range when i and b are ints,
+    # anything else goes through the normal loop (same as do_for_loop above)
+    def compile_counting_loop(self, statement_node, counter, init, condition, update, statements):
+        interp = self.interp
+        nil = self.nil
+        slot, comparison, step = counter
+        bound = self.compile_expression(statement_node.dict['condition'].dict['op2'])
+
+        def do_counting_loop(L):
+            init(L)
+            start = L[slot]
+            if type(start) is int:
+                end = bound(L)
+                if type(end) is int:
+                    values = counter_range(start, comparison, end, step)
+                    for i in values:
+                        L[slot] = i
+                        for statement in statements:
+                            return_value = statement(L)
+                            if return_value is not nil:
+                                return return_value
+                    if values:
+                        L[slot] = values[-1] + step
+                    return nil
+            while True:
+                result = condition(L)
+                if type(result) is not bool:
+                    interp.error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+                if not result:
+                    return nil
+                for statement in statements:
+                    return_value = statement(L)
+                    if return_value is not nil:
+                        return return_value
+                update(L)
+        return do_counting_loop
+
+    ### FUNCTION CALLS ###
+
+    def compile_func_call(self, call_node):
+        func_call = call_node.dict['name']
+        args = [self.compile_expression(arg) for arg in call_node.dict['args']]
+        if func_call == "print":
+            return self.compile_print(args)
+        if func_call == "inputi" or func_call == "inputs":
+            return self.compile_input(func_call, args)
+        return self.compile_user_call(func_call, args, call_node.dict.get('tail_call'))
+
+    def compile_print(self, args):
+        interp = self.interp
+        nil = self.nil
+
+        def do_print(L):
+            output = ""
+            for arg in args:
+                eval = arg(L)
+                if type(eval) is bool:
+                    output += "true" if eval else "false"
+                else:
+                    # tree walker evaluates non-bool args a second time here, keep that.
+                    output += str(arg(L))
+            interp.output(output)
+            return nil
+        return do_print
+
+    def compile_input(self, func_call, args):
+        interp = self.interp
+
+        def do_input(L):
+            if len(args) > 1:
+                interp.error(ErrorType.NAME_ERROR, f"No {func_call}() function found that takes > 1 parameter",)
+            elif len(args) == 1:
+                interp.output(args[0](L))
+            user_in = interp.get_input()
+            try:
+                return int(user_in)
+            except:
+                return user_in
+        return do_input
+
+    def compile_user_call(self, func_call, args, tail_call=False):
+        compiler = self
+        interp = self.interp
+        # functions can't change after parsing, so the lookup is done here once.
+        # errors still need to happen when the call runs though.
+        if not interp.check_valid_func(func_call):
+            def func_not_found(L):
+                interp.error(ErrorType.NAME_ERROR, f"Function {func_call} was not found",)
+            return func_not_found
+
+        func_def = interp.func_table.get((func_call, len(args)))
+        if func_def is None:
+            arg_len = len(args)
+
+            def wrong_arg_count(L):
+                interp.error(ErrorType.NAME_ERROR, f"Incorrect amount of arguments given: {arg_len} ",)
+            return wrong_arg_count
+
+        frame_size = func_def.dict['frame_size']
+        params = tuple(enumerate(args))
+        body = self.func_bodies[id(func_def)]
+
+        if tail_call:
+            def do_tail_call(L):
+                # args still run in our frame, then our frame gets reused for the callee
+                compiler.pending_tail_call = (body, frame_size, [arg(L) for arg in args])
+                return TAIL_CALL
+            return do_tail_call
+
+        if interp.memo is not None and 'pure' in func_def.dict:
+            return self.compile_memoized_call(func_def, body, frame_size, params)
+
+        def do_func_call(L):
+            # callee gets a fresh frame with only its arguments in it
+            frame = [None] * frame_size
+            for slot, arg in params:
+                frame[slot] = arg(L)
+            return_value = body[0](frame)
+            if return_value is TAIL_CALL:
+                return_value = compiler.run_tail_calls(frame)
+            return return_value
+        return do_func_call
+
+    # call to a pure function with memoize on: same as do_func_call, but checks interp.memo first
+    def compile_memoized_call(self, func_def, body, frame_size, params):
+        compiler = self
+        memo = self.interp.memo
+        arg_count = len(params)
+
+        def do_memoized_call(L):
+            frame = [None] * frame_size
+            for slot, arg in params:
+                frame[slot] = arg(L)
+            memo_key = make_key(func_def, frame[:arg_count])
+            return_value = memo.get(memo_key)
+            if return_value is not MISSING:
+                return return_value
+            return_value = body[0](frame)
+            if return_value is TAIL_CALL:
+                return_value = compiler.run_tail_calls(frame)
+            memo.put(memo_key, return_value)
+            return return_value
+        return do_memoized_call
+
+    ### EXPRESSIONS ###
+
+    def compile_expression(self, expression_node):
+        kind = expression_node.elem_type
+        if kind in (InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE, InterpreterBase.BOOL_NODE):
+            value = expression_node.dict['val']
+            return lambda L: value
+        if kind == InterpreterBase.NIL_NODE:
+            nil = self.nil
+            return lambda L: nil
+        if kind == InterpreterBase.VAR_NODE:
+            return self.compile_variable(expression_node)
+        if 'typed' in expression_node.dict:
+            return self.compile_typed_operator(expression_node)
+        if kind in ("+", "-", "*", "/"):
+            return self.compile_binary_operator(expression_node)
+        if kind == InterpreterBase.NEG_NODE:
+            return self.compile_neg(expression_node)
+        if kind == InterpreterBase.NOT_NODE:
+            return self.compile_not(expression_node)
+        if kind in ('==', '<', '<=', '>', '>=', '!='):
+            return self.compile_comparison_operator(expression_node)
+        if kind in ('&&', '||'):
+            return self.compile_binary_boolean_operator(expression_node)
+        if kind == InterpreterBase.FCALL_NODE:
+            return self.compile_func_call(expression_node)
+        if kind == INLINE_NODE:
+            return self.compile_inline(expression_node)
+        if kind == HOISTED_NODE:
+            return self.compile_hoisted(expression_node)
+        # evaluate_expression returns None for anything it doesn't know
+        return lambda L: None
+
+    # inlined call (see inliner.py): args go into their slots in our frame, then the func's expression runs
+    def compile_inline(self, expression_node):
+        args = [self.compile_expression(arg) for arg in expression_node.dict['args']]
+        params = tuple(zip(expression_node.dict['slots'], args))
+        body = self.compile_expression(expression_node.dict['expression'])
+        if len(params) == 1:
+            slot, arg = params[0]
+
+            def do_inline_one(L):
+                L[slot] = arg(L)
+                return body(L)
+            return do_inline_one
+
+        def do_inline(L):
+            for slot, arg in params:
+                L[slot] = arg(L)
+            return body(L)
+        return do_inline
+
+    # loop-invariant expression (see licm.py): computed the first time the loop gets here, then reused
+    def compile_hoisted(self, expression_node):
+        slot = expression_node.dict['slot']
+        expression = self.compile_expression(expression_node.dict['expression'])
+
+        def get_hoisted_value(L):
+            val = L[slot]
+            if val is None:
+                val = L[slot] = expression(L)
+            return val
+        return get_hoisted_value
+
+    def compile_variable(self, expression_node):
+        interp = self.interp
+        var_name = expression_node.dict['name']
+        slot = expression_node.dict['slot']
+        if slot is None:
+            def not_declared(L):
+                interp.error(ErrorType.NAME_ERROR, f"variable '{var_name}' used and not declared",)
+            return not_declared
+
+        def get_value_of_variable(L):
+            val = L[slot]
+            if val is None:
+                interp.error(ErrorType.NAME_ERROR, f"variable '{var_name}' declared but not defined",)
+            return val
+        return get_value_of_variable
+
+    # operand types are known to be right (see typeinfer.py), so no type checks.
+    # && and || still evaluate both sides, & and | on two bools give a bool.
+    def compile_typed_operator(self, expression_node):
+        kind = expression_node.elem_type
+        op1 = self.compile_expression(expression_node.dict['op1'])
+        if kind == InterpreterBase.NEG_NODE:
+            return lambda L: -op1(L)
+        if kind == InterpreterBase.NOT_NODE:
+            return lambda L: not op1(L)
+        op2 = self.compile_expression(expression_node.dict['op2'])
+        if kind == '+':
+            return lambda L: op1(L) + op2(L)
+        if kind == '-':
+            return lambda L: op1(L) - op2(L)
+        if kind == '*':
+            return lambda L: op1(L) * op2(L)
+        if kind == '/':
+            return lambda L: op1(L) // op2(L)
+        if kind == '<':
+            return lambda L: op1(L) < op2(L)
+        if kind == '<=':
+            return lambda L: op1(L) <= op2(L)
+        if kind == '>':
+            return lambda L: op1(L) > op2(L)
+        if kind == '>=':
+            return lambda L: op1(L) >= op2(L)
+        if kind == '==':
+            return lambda L: op1(L) == op2(L)
+        if kind == '!=':
+            return lambda L: op1(L) != op2(L)
+        if kind == '&&':
+            return lambda L: op1(L) & op2(L)
+        return lambda L: op1(L) | op2(L)
+
+    def compile_binary_operator(self, expression_node):
+        interp = self.interp
+        kind = expression_node.elem_type
+        op1 = self.compile_expression(expression_node.dict['op1'])
+        op2 = self.compile_expression(expression_node.dict['op2'])
+
+        if kind == "+":
+            def add(L):
+                eval1 = op1(L)
+                eval2 = op2(L)
+                if not ((type(eval1) == int and type(eval2) == int) or (type(eval1) == str and type(eval2) == str)):
+                    interp.error(ErrorType.TYPE_ERROR, "Types for + must be both of type int or string.",)
+                return eval1 + eval2
+            return add
+
+        # everything else is int only
+        message = "Arguments must be of type 'int'."
+        if kind == "-":
+            def sub(L):
+                eval1 = op1(L)
+                eval2 = op2(L)
+                if not (type(eval1) == int and type(eval2) == int):
+                    interp.error(ErrorType.TYPE_ERROR, message,)
+                return eval1 - eval2
+            return sub
+        if kind == "*":
+            def mul(L):
+                eval1 = op1(L)
+                eval2 = op2(L)
+                if not (type(eval1) == int and type(eval2) == int):
+                    interp.error(ErrorType.TYPE_ERROR, message,)
+                return eval1 * eval2
+            return mul
+
+        def div(L):
+            eval1 = op1(L)
+            eval2 = op2(L)
+            if not (type(eval1) == int and type(eval2) == int):
+                interp.error(ErrorType.TYPE_ERROR, message,)
+            # integer division
+            return eval1 // eval2
+        return div
+
+    def compile_neg(self, expression_node):
+        interp = self.interp
+        op1 = self.compile_expression(expression_node.dict['op1'])
+
+        def neg(L):
+            eval = op1(L)
+            if not (type(eval) == int):
+                interp.error(ErrorType.TYPE_ERROR, "'negation' can only be used on integer values.",)
+            return -(eval)
+        return neg
+
+    def compile_not(self, expression_node):
+        interp = self.interp
+        op1 = self.compile_expression(expression_node.dict['op1'])
+
+        def not_(L):
+            eval = op1(L)
+            if not (type(eval) == bool):
+                interp.error(ErrorType.TYPE_ERROR, "'Not' can only be used on boolean values.",)
+            return not (eval)
+        return not_
+
+    def compile_comparison_operator(self, expression_node):
+        interp = self.interp
+        kind = expression_node.elem_type
+        op1 = self.compile_expression(expression_node.dict['op1'])
+        op2 = self.compile_expression(expression_node.dict['op2'])
+
+        # != and == can compare different types.
+        if kind == '==':
+            def equal(L):
+                eval1 = op1(L)
+                eval2 = op2(L)
+                if not (type(eval1) == type(eval2)):
+                    return False
+                return eval1 == eval2
+            return equal
+        if kind == '!=':
+            def not_equal(L):
+                eval1 = op1(L)
+                eval2 = op2(L)
+                if not (type(eval1) == type(eval2)):
+                    return True
+                return eval1 != eval2
+            return not_equal
+
+        message = f"Comparison args for {kind} must be of same type int."
+        if kind == '<':
+            def less(L):
+                eval1 = op1(L)
+                eval2 = op2(L)
+                if not (type(eval1) == int and type(eval2) == int):
+                    interp.error(ErrorType.TYPE_ERROR, message,)
+                return eval1 < eval2
+            return less
+        if kind == '<=':
+            def less_eq(L):
+                eval1 = op1(L)
+                eval2 = op2(L)
+                if not (type(eval1) == int and type(eval2) == int):
+                    interp.error(ErrorType.TYPE_ERROR, message,)
+                return eval1 <= eval2
+            return less_eq
+        if kind == '>':
+            def greater(L):
+                eval1 = op1(L)
+                eval2 = op2(L)
+                if not (type(eval1) == int and type(eval2) == int):
+                    interp.error(ErrorType.TYPE_ERROR, message,)
+                return eval1 > eval2
+            return greater
+
+        def greater_eq(L):
+            eval1 = op1(L)
+            eval2 = op2(L)
+            if not (type(eval1) == int and type(eval2) == int):
+                interp.error(ErrorType.TYPE_ERROR, message,)
+            return eval1 >= eval2
+        return greater_eq
+
+    def compile_binary_boolean_operator(self, expression_node):
+        interp = self.interp
+        kind = expression_node.elem_type
+        op1 = self.compile_expression(expression_node.dict['op1'])
+        op2 = self.compile_expression(expression_node.dict['op2'])
+        message = f"Comparison args for {kind} must be of same type bool."
+
+        # forces evaluation on both (strict evaluation)
+        if kind == '&&':
+            def and_(L):
+                eval1 = op1(L)
+                eval2 = op2(L)
+                if (type(eval1) is not bool) or (type(eval2) is not bool):
+                    interp.error(ErrorType.TYPE_ERROR, message,)
+                return eval1 and eval2
+            return and_
+
+        def or_(L):
+            eval1 = op1(L)
+            eval2 = op2(L)
+            if (type(eval1) is not bool) or (type(eval2) is not bool):
+                interp.error(ErrorType.TYPE_ERROR, message,)
+            return eval1 or eval2
+        return or_
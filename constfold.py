@@ -0,0 +1,147 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Constant folding pass: runs right after parse_program and replaces operator subtrees whose operands are all
+# literals with the literal they evaluate to, so e.g. `60 * 60 * 24` or `"a" + "b"` inside a loop isn't
+# re-computed (and re-type-checked) every time around.
+#
+# Folds +, -, *, /, the comparisons, ==/!=, &&/||, neg and ! using the same rules as the evaluate_* methods in
+# interpreterv2. Anything that would error at runtime (wrong types, dividing by 0) is left alone, so the error
+# still happens at the same point when (and if) that expression actually runs.
+# Bare expression statements are never evaluated, so they're left alone too.
+
+from element import Element
+from intbase import InterpreterBase
+
+ARITHMETIC = ('+', '-', '*', '/')
+COMPARISONS = ('<', '<=', '>', '>=')
+LITERALS = (InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE, InterpreterBase.BOOL_NODE, InterpreterBase.NIL_NODE)
+
+# returned by the fold_* helpers when the expression can't be folded
+NOT_CONST = object()
+# stands in for the value of a nil literal, so nil == nil but nil != anything else
+NIL_VALUE = object()
+
+
+class ConstantFolder:
+    def __init__(self):
+        # number of operator nodes replaced by literals
+        self.count = 0
+
+    def fold_program(self, ast):
+        for func in ast.dict['functions']:
+            self.fold_statements(func.dict['statements'])
+        return self.count
+
+    def fold_statements(self, statements):
+        for statement in statements or ():
+            self.fold_statement(statement)
+
+    def fold_statement(self, statement_node):
+        kind = statement_node.elem_type
+        if kind == "=":
+            statement_node.dict['expression'] = self.fold_expression(statement_node.dict['expression'])
+        elif kind == InterpreterBase.RETURN_NODE:
+            if statement_node.dict['expression']:
+                statement_node.dict['expression'] = self.fold_expression(statement_node.dict['expression'])
+        elif kind == InterpreterBase.IF_NODE:
+            statement_node.dict['condition'] = self.fold_expression(statement_node.dict['condition'])
+            self.fold_statements(statement_node.dict['statements'])
+            self.fold_statements(statement_node.dict['else_statements'])
+        elif kind == InterpreterBase.FOR_NODE:
+            self.fold_statement(statement_node.dict['init'])
+            statement_node.dict['condition'] = self.fold_expression(statement_node.dict['condition'])
+            self.fold_statement(statement_node.dict['update'])
+            self.fold_statements(statement_node.dict['statements'])
+        elif kind == InterpreterBase.FCALL_NODE:
+            self.fold_expression(statement_node)
+
+    # returns the node to use in place of expression_node (itself, or a new literal)
+    def fold_expression(self, expression_node):
+        kind = expression_node.elem_type
+        if kind == InterpreterBase.FCALL_NODE:
+            args = expression_node.dict['args']
+            for i in range(len(args)):
+                args[i] = self.fold_expression(args[i])
+            return expression_node
+        if 'op1' not in expression_node.dict:
+            return expression_node
+
+        op1 = expression_node.dict['op1'] = self.fold_expression(expression_node.dict['op1'])
+        if 'op2' in expression_node.dict:
+            op2 = expression_node.dict['op2'] = self.fold_expression(expression_node.dict['op2'])
+            if op1.elem_type not in LITERALS or op2.elem_type not in LITERALS:
+                return expression_node
+            value = fold_binary(kind, literal_value(op1), literal_value(op2))
+        else:
+            if op1.elem_type not in LITERALS:
+                return expression_node
+            value = fold_unary(kind, literal_value(op1))
+        if value is NOT_CONST:
+            return expression_node
+        self.count += 1
+        return make_literal(value)
+
+
+def literal_value(node):
+    if node.elem_type == InterpreterBase.NIL_NODE:
+        return NIL_VALUE
+    return node.dict['val']
+
+
+def fold_binary(kind, val1, val2):
+    both_ints = type(val1) is int and type(val2) is int
+    if kind in ARITHMETIC:
+        if kind == '+' and type(val1) is str and type(val2) is str:
+            return val1 + val2
+        if not both_ints:
+            return NOT_CONST
+        if kind == '+':
+            return val1 + val2
+        if kind == '-':
+            return val1 - val2
+        if kind == '*':
+            return val1 * val2
+        if val2 == 0:
+            return NOT_CONST
+        return val1 // val2
+    if kind in COMPARISONS:
+        if not both_ints:
+            return NOT_CONST
+        if kind == '<':
+            return val1 < val2
+        if kind == '<=':
+            return val1 <= val2
+        if kind == '>':
+            return val1 > val2
+        return val1 >= val2
+    if kind == '==':
+        return type(val1) == type(val2) and val1 == val2
+    if kind == '!=':
+        return type(val1) != type(val2) or val1 != val2
+    if kind == '&&' or kind == '||':
+        if type(val1) is not bool or type(val2) is not bool:
+            return NOT_CONST
+        return (val1 and val2) if kind == '&&' else (val1 or val2)
+    return NOT_CONST
+
+
+def fold_unary(kind, val):
+    if kind == InterpreterBase.NEG_NODE and type(val) is int:
+        return -val
+    if kind == InterpreterBase.NOT_NODE and type(val) is bool:
+        return not val
+    return NOT_CONST
+
+
+def make_literal(value):
+    if type(value) is bool:
+        return Element(InterpreterBase.BOOL_NODE, val=value)
+    if type(value) is int:
+        return Element(InterpreterBase.INT_NODE, val=value)
+    return Element(InterpreterBase.STRING_NODE, val=value)
+
+
+# exported function, returns how many nodes were folded
+def fold_constants(ast):
+    return ConstantFolder().fold_program(ast)
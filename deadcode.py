@@ -0,0 +1,178 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Dead code elimination: runs after constfold.py (so `if (1 > 2)` already looks like `if (false)`) and before the
+# resolver, and throws away parts of the AST that can never run:
+#   - statements after something that always ends the function. That's `return;`, `return <non-nil literal>;`,
+#     or an if/else where both branches always end. (`return x;` doesn't count, if x is nil the function keeps going!)
+#   - the branch of an if (true)/if (false) that can't be taken. If the other branch doesn't declare any variables
+#     at its top level, its statements go straight into the enclosing block (no scope needed), otherwise the if
+#     stays with just that branch.
+#   - bare expression statements other than calls (the interpreter never evaluates those anyway)
+#   - functions that can't be reached from main. Reachability goes by name, not (name, arg count), so a call with
+#     the wrong number of args still finds the name and gives the same error. Skipped entirely if there's no main
+#     or a function is defined twice, so those errors still happen.
+
+from intbase import InterpreterBase
+
+LITERALS = (InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE, InterpreterBase.BOOL_NODE)
+STATEMENTS = ("=", InterpreterBase.VAR_DEF_NODE, InterpreterBase.FCALL_NODE, InterpreterBase.RETURN_NODE,
+              InterpreterBase.IF_NODE, InterpreterBase.FOR_NODE)
+
+
+class DeadCodeEliminator:
+    # returns how many statements/functions were removed
+    def prune_program(self, ast):
+        before = count_nodes(ast)
+        for func in ast.dict['functions']:
+            func.dict['statements'] = self.prune_block(func.dict['statements'])
+        self.prune_functions(ast)
+        return before - count_nodes(ast)
+
+    # returns the new statement list for a block
+    def prune_block(self, statements):
+        if not statements:
+            return statements
+        pruned = []
+        for statement in statements:
+            kind = statement.elem_type
+            if kind not in STATEMENTS:
+                continue
+            if kind == InterpreterBase.IF_NODE:
+                replacement = self.prune_if(statement)
+                if replacement is not None:
+                    pruned.extend(replacement)
+                    if block_always_returns(replacement):
+                        break
+                    continue
+            elif kind == InterpreterBase.FOR_NODE:
+                statement.dict['statements'] = self.prune_block(statement.dict['statements'])
+            pruned.append(statement)
+            if always_returns(statement):
+                break
+        return pruned
+
+    # returns a list of statements to replace the if with, or None to keep it (branches get pruned either way)
+    def prune_if(self, if_node):
+        if_node.dict['statements'] = self.prune_block(if_node.dict['statements'])
+        if if_node.dict['else_statements'] is not None:
+            if_node.dict['else_statements'] = self.prune_block(if_node.dict['else_statements'])
+        condition = if_node.dict['condition']
+        if condition.elem_type != InterpreterBase.BOOL_NODE:
+            return None
+        if condition.dict['val']:
+            taken = if_node.dict['statements']
+            if_node.dict['else_statements'] = None
+        else:
+            taken = if_node.dict['else_statements'] or []
+            if_node.dict['statements'] = taken
+            if_node.dict['else_statements'] = None
+            condition.dict['val'] = True
+        if any(statement.elem_type == InterpreterBase.VAR_DEF_NODE for statement in taken):
+            return None
+        return taken
+
+    def prune_functions(self, ast):
+        functions = ast.dict['functions']
+        by_name = {}
+        seen = set()
+        for func in functions:
+            key = (func.dict['name'], len(func.dict['args']))
+            if key in seen:
+                return
+            seen.add(key)
+            by_name.setdefault(func.dict['name'], []).append(func)
+        if "main" not in by_name:
+            return
+
+        reachable = set()
+        todo = ["main"]
+        while todo:
+            name = todo.pop()
+            if name in reachable or name not in by_name:
+                continue
+            reachable.add(name)
+            for func in by_name[name]:
+                calls = []
+                find_calls(func.dict['statements'], calls)
+                todo.extend(call.dict['name'] for call in calls)
+
+        ast.dict['functions'] = [func for func in functions if func.dict['name'] in reachable]
+
+
+# True if running statement always ends the function
+def always_returns(statement):
+    kind = statement.elem_type
+    if kind == InterpreterBase.RETURN_NODE:
+        expression = statement.dict['expression']
+        return expression is None or expression.elem_type in LITERALS
+    if kind == InterpreterBase.IF_NODE:
+        else_statements = statement.dict['else_statements']
+        if else_statements is None:
+            return False
+        return block_always_returns(statement.dict['statements']) and block_always_returns(else_statements)
+    return False
+
+
+def block_always_returns(statements):
+    for statement in statements or ():
+        if always_returns(statement):
+            return True
+    return False
+
+
+def count_nodes(ast):
+    count = 0
+    for func in ast.dict['functions']:
+        count += 1 + count_statements(func.dict['statements'])
+    return count
+
+
+# statements in a block, counting nested ones
+def count_statements(statements):
+    count = 0
+    for statement in statements or ():
+        count += 1
+        if statement.elem_type in (InterpreterBase.IF_NODE, InterpreterBase.FOR_NODE):
+            count += count_statements(statement.dict['statements'])
+        if statement.elem_type == InterpreterBase.IF_NODE:
+            count += count_statements(statement.dict['else_statements'])
+    return count
+
+
+# adds every fcall node anywhere in statements to calls
+def find_calls(statements, calls):
+    for statement in statements or ():
+        find_calls_in(statement, calls)
+
+
+def find_calls_in(node, calls):
+    kind = node.elem_type
+    if kind == InterpreterBase.FCALL_NODE:
+        calls.append(node)
+        for arg in node.dict['args']:
+            find_calls_in(arg, calls)
+    elif kind == InterpreterBase.IF_NODE:
+        find_calls_in(node.dict['condition'], calls)
+        find_calls(node.dict['statements'], calls)
+        find_calls(node.dict['else_statements'], calls)
+    elif kind == InterpreterBase.FOR_NODE:
+        find_calls_in(node.dict['init'], calls)
+        find_calls_in(node.dict['condition'], calls)
+        find_calls_in(node.dict['update'], calls)
+        find_calls(node.dict['statements'], calls)
+    elif kind == "=" or kind == InterpreterBase.RETURN_NODE:
+        if node.dict['expression'] is not None:
+            find_calls_in(node.dict['expression'], calls)
+    else:
+        # operators, and inline nodes from inliner.py (args + the inlined expression)
+        for arg in node.dict.get('args', ()):
+            find_calls_in(arg, calls)
+        for key in ('op1', 'op2', 'expression'):
+            if key in node.dict:
+                find_calls_in(node.dict[key], calls)
+
+
+# exported function, returns how many statements/functions were removed
+def prune_program(ast):
+    return DeadCodeEliminator().prune_program(ast)
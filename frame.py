@@ -0,0 +1,13 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# One call of a Brewin function.
+# Frames are linked through parent, so pushing a call is just making a new Frame and popping is following parent
+# (no copying the caller's variables around).
+class Frame:
+    __slots__ = ('func', 'parent', 'locals')
+
+    def __init__(self, func, parent, frame_size):
+        self.func = func            # func node being run
+        self.parent = parent        # caller's frame (None for main)
+        self.locals = [None] * frame_size   # variables, indexed by the slots resolver.py assigned
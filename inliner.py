@@ -0,0 +1,164 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Inliner: replaces calls to small functions with the function's body, so they don't need a frame, a call
+# and a return every time. Runs after constfold.py/deadcode.py and before the resolver (so the resolver gives
+# the inlined code its slots).
+#
+# Only functions that are just `return <expression>;` get inlined, and only if:
+#   - they aren't recursive (can't reach themselves through any chain of calls)
+#   - the expression (with whatever got inlined into it) has at most max_size nodes
+#   - no function is defined twice (that's an error when the program starts, so nothing gets touched)
+# `return <expression>;` whose value is nil just falls off the end and returns nil, so the call's value is
+# always the expression's value.
+#
+# A call can't just be swapped for the expression with the args pasted in: every arg has to run exactly once,
+# left to right, before the body (an arg used twice or never, or in a different order, would change output and
+# which error happens first). So the call becomes an 'inline' node:
+#   inline -> 'name': func name, 'params': param names, 'args': arg expressions, 'expression': copy of the body
+# The engines evaluate the args into fresh slots of the *caller's* frame, then the expression. The resolver
+# gives the expression a scope with only the params in it, so it still can't see the caller's variables.
+# resolver.py adds 'slots': the slot for each param.
+#
+# Only calls whose value gets used are inlined. A bare `f();` statement stays a call.
+
+import copy
+
+from intbase import InterpreterBase
+from element import Element
+from deadcode import find_calls
+
+INLINE_NODE = "inline"
+BUILTINS = ("print", "inputi", "inputs")
+
+
+class Inliner:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        # (name, number of args) -> func node
+        self.func_table = {}
+        # (name, number of args) -> inlined body of the function, or None if it can't be inlined
+        self.bodies = {}
+        # (name, number of args) -> how many calls to it got inlined
+        self.inlined = {}
+
+    def inline_program(self, ast):
+        functions = ast.dict['functions']
+        for func in functions:
+            key = (func.dict['name'], len(func.dict['args']))
+            if key in self.func_table:
+                return self.inlined
+            self.func_table[key] = func
+        for func in functions:
+            self.inline_statements(func.dict['statements'])
+        return self.inlined
+
+    # the expression to paste in for a call to key (calls in it already inlined), or None
+    def get_body(self, key):
+        if key not in self.bodies:
+            # None while working on it, so a cycle we didn't catch can't loop forever
+            self.bodies[key] = None
+            func = self.func_table[key]
+            if not self.is_recursive(key):
+                statements = func.dict['statements']
+                if len(statements) == 1 and statements[0].elem_type == InterpreterBase.RETURN_NODE \
+                        and statements[0].dict['expression'] is not None:
+                    body = copy.deepcopy(statements[0].dict['expression'])
+                    body = self.inline_expression(body, False)
+                    if count_nodes(body) <= self.max_size:
+                        self.bodies[key] = body
+        return self.bodies[key]
+
+    # True if the function can end up calling itself
+    def is_recursive(self, key):
+        seen = set()
+        todo = [key]
+        while todo:
+            calls = []
+            find_calls(self.func_table[todo.pop()].dict['statements'], calls)
+            for call in calls:
+                callee = (call.dict['name'], len(call.dict['args']))
+                if callee == key:
+                    return True
+                if callee in self.func_table and callee not in seen:
+                    seen.add(callee)
+                    todo.append(callee)
+        return False
+
+    def inline_statements(self, statements):
+        for statement in statements or ():
+            kind = statement.elem_type
+            if kind == "=":
+                statement.dict['expression'] = self.inline_expression(statement.dict['expression'])
+            elif kind == InterpreterBase.FCALL_NODE:
+                # the call itself stays (its value decides if the function ends), its args can still be inlined
+                args = statement.dict['args']
+                for i in range(len(args)):
+                    args[i] = self.inline_expression(args[i])
+            elif kind == InterpreterBase.RETURN_NODE:
+                if statement.dict['expression'] is not None:
+                    statement.dict['expression'] = self.inline_expression(statement.dict['expression'])
+            elif kind == InterpreterBase.IF_NODE:
+                statement.dict['condition'] = self.inline_expression(statement.dict['condition'])
+                self.inline_statements(statement.dict['statements'])
+                self.inline_statements(statement.dict['else_statements'])
+            elif kind == InterpreterBase.FOR_NODE:
+                self.inline_statements([statement.dict['init'], statement.dict['update']])
+                statement.dict['condition'] = self.inline_expression(statement.dict['condition'])
+                self.inline_statements(statement.dict['statements'])
+
+    # returns the node to use instead of expression_node. counting is off while building a func's body,
+    # those only count once they're pasted into a call site
+    def inline_expression(self, expression_node, counting=True):
+        kind = expression_node.elem_type
+        if kind == InterpreterBase.FCALL_NODE:
+            args = expression_node.dict['args']
+            for i in range(len(args)):
+                args[i] = self.inline_expression(args[i], counting)
+            key = (expression_node.dict['name'], len(args))
+            if key[0] in BUILTINS or key not in self.func_table:
+                return expression_node
+            body = self.get_body(key)
+            if body is None:
+                return expression_node
+            params = [arg.dict['name'] for arg in self.func_table[key].dict['args']]
+            # every call site gets its own copy, the resolver puts different slots in each
+            inline_node = Element(INLINE_NODE, name=key[0], params=params, args=args, expression=copy.deepcopy(body))
+            if counting:
+                # the args were counted above, the body's inlined calls weren't yet
+                self.inlined[key] = self.inlined.get(key, 0) + 1
+                self.count_inlined(inline_node.dict['expression'])
+            return inline_node
+        for key in ('op1', 'op2'):
+            if key in expression_node.dict:
+                expression_node.dict[key] = self.inline_expression(expression_node.dict[key], counting)
+        return expression_node
+
+    def count_inlined(self, expression_node):
+        if expression_node.elem_type == INLINE_NODE:
+            key = (expression_node.dict['name'], len(expression_node.dict['params']))
+            self.inlined[key] = self.inlined.get(key, 0) + 1
+            self.count_inlined(expression_node.dict['expression'])
+        for arg in expression_node.dict.get('args', ()):
+            self.count_inlined(arg)
+        for key in ('op1', 'op2'):
+            if key in expression_node.dict:
+                self.count_inlined(expression_node.dict[key])
+
+
+# expression nodes in an expression (inline nodes count their args and body)
+def count_nodes(expression_node):
+    count = 1
+    if expression_node.elem_type == INLINE_NODE:
+        count += count_nodes(expression_node.dict['expression'])
+    for arg in expression_node.dict.get('args', ()):
+        count += count_nodes(arg)
+    for key in ('op1', 'op2'):
+        if key in expression_node.dict:
+            count += count_nodes(expression_node.dict[key])
+    return count
+
+
+# exported function, returns {(name, number of args): how many calls got inlined}
+def inline_program(ast, max_size):
+    return Inliner(max_size).inline_program(ast)
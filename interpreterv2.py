@@ -3,29 +3,194 @@
 
 from brewparse import *
 from intbase import *
+from closure_backend import ClosureCompiler
+from bytecode import BytecodeCompiler, VirtualMachine
+from stackless import StacklessEvaluator
+from transpiler import run_transpiled, cache_key
+from tracejit import TraceJIT
+from resolver import resolve_program
+from frame import Frame
+from tailcalls import mark_tail_calls
+from loops import mark_counting_loops, counter_range
+from constfold import fold_constants
+from deadcode import prune_program
+from inliner import inline_program, INLINE_NODE
+from licm import hoist_loop_invariants, HOISTED_NODE
+from typeinfer import infer_types, OPERATORS
+from quicken import QUICKENED, UNARY_KINDS, record_types, despecialize
+from purity import mark_pure_functions
+from memo import LRUCache, MISSING, make_key
 
 nil = Element("nil")
+# returned by a tail call instead of its value: the function running it is done,
+# and its frame should be reused to run self.pending_tail_call (see run_frame)
+TAIL_CALL = Element("tail_call")
+
+
+# Statements that end their function (a return, or a call that gave back a non-nil value) return this
+# instead of nil. Each interpreter only has one: the value gets overwritten by every return and run_func
+# reads it right away, so returning doesn't allocate anything on the way out of nested ifs/loops.
+class ReturnSignal:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = nil
 
 class Interpreter(InterpreterBase):
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    # engine picks how the program gets executed:
+    #   "tree"    -> walk the Element tree directly (default)
+    #   "closure" -> compile every func into python closures once, then run those (see closure_backend.py)
+    #   "bytecode" -> compile to bytecode and run it on the stack VM (see bytecode.py)
+    #   "stackless" -> walk the tree with an explicit work stack instead of python recursion (see stackless.py)
+    #   "python"  -> generate python source for the whole program and compile() it (see transpiler.py). The compiled
+    #                code is cached by source hash, so running the same program again skips straight to running it.
+    # max_depth: most nested Brewin calls allowed by the engines that keep their own call stack
+    # ("bytecode" and "stackless"), None for no limit. Going over it is a FAULT_ERROR.
+    # tail_calls: reuse the caller's frame for calls in tail position (see tailcalls.py), so tail recursion
+    # runs in constant memory. Turn off to get a real call for every call.
+    # constant_folding: replace constant subexpressions with their value before running (see constfold.py).
+    # how many nodes got folded ends up in self.folded_nodes.
+    # dead_code: drop statements/functions that can never run before running (see deadcode.py),
+    # how many got dropped ends up in self.pruned_nodes.
+    # inlining: paste the expression of small `return <expression>;` functions in place of calls to them
+    # (see inliner.py), if it has at most inline_size nodes. self.inlined has {(name, number of args): calls inlined}.
+    # loop_invariants: compute expressions that can't change inside a for loop only once per run of the loop
+    # (see licm.py), how many got hoisted ends up in self.hoisted_nodes. ("tree", "closure" and "python" engines)
+    # type_inference: find operators whose operand types are always right (see typeinfer.py) and skip their
+    # type checks, how many were found ends up in self.typed_nodes. ("tree", "closure" and "python" engines)
+    # quickening: operator nodes specialize themselves for the operand types they keep seeing (see quicken.py).
+    # "tree" engine only.
+    # memoize: cache results of functions that can't print or read input (see purity.py/memo.py) in an LRU
+    # of memo_size entries. self.memo has the hits/misses of the last run. ("tree" and "closure" engines)
+    # tracing: for loops that have run hot_loop iterations get the types of one iteration recorded and compiled
+    # into a python function that runs the rest of them (see tracejit.py). self.tracer has how many traces got
+    # compiled and how many times one bailed back to the tree walker. "tree" engine only.
+    # parser: "ply" (default) or "descent" (hand-written recursive descent, see rdparse.py). same AST either way
+    # trace_output: print the AST (after folding/pruning/inlining) before running it.
+    def __init__(self, console_output=True, inp=None, trace_output=False, engine="tree", max_depth=1000000,
+                 tail_calls=True, constant_folding=True, dead_code=True, inlining=True, inline_size=12,
+                 loop_invariants=True, type_inference=True, quickening=False, memoize=False, memo_size=1024,
+                 tracing=False, hot_loop=50, parser="ply"):
         super().__init__(console_output, inp)   # call InterpreterBase's constructor
+        if engine not in ("tree", "closure", "bytecode", "stackless", "python"):
+            raise ValueError(f"Unknown engine: {engine}")
+        self.engine = engine
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser: {parser}")
+        self.parser = parser
+        self.max_depth = max_depth
+        self.tail_calls = tail_calls
+        self.constant_folding = constant_folding
+        self.folded_nodes = 0
+        self.dead_code = dead_code
+        self.pruned_nodes = 0
+        self.inlining = inlining
+        self.inline_size = inline_size
+        self.inlined = {}
+        self.loop_invariants = loop_invariants
+        self.hoisted_nodes = 0
+        self.type_inference = type_inference
+        self.typed_nodes = 0
+        self.quickening = quickening
+        self.memoize = memoize
+        self.memo_size = memo_size
+        self.memo = None
+        self.tracing = tracing
+        self.hot_loop = hot_loop
+        self.tracer = None
+        self.trace_output = trace_output
+        # (func node, arg values) of the tail call that's waiting for its frame
+        self.pending_tail_call = None
+        self.return_signal = ReturnSignal()
+        # compiled program from the last run (bytecode engine only), handy for bytecode.disassemble()
+        self.bytecode = None
+        # generated python source from the last run that wasn't cached ("python" engine only)
+        self.python_source = None
         # Since functions (at the top level) can be created anywhere, we'll just do a search for function definitions and assign them 'globally'
         self.func_defs = []
-        # Copilot: (+1)
-        self.variable_scope_stack = [{}] # Stack to hold variable scopes
-        
+        # (name, number of args) -> func node, and every function name (for the "not found" error)
+        self.func_table = {}
+        self.func_names = set()
+        # frame of the function currently running (callers are linked through .parent)
+        self.frame = None
+
 
     def run(self, program):
-        ast = parse_program(program) # returns list of function nodes
+        if self.engine == "python":
+            # the generated code only depends on the source and the options that change the AST
+            key = None
+            if not self.trace_output:
+                key = cache_key(program, (self.constant_folding, self.dead_code, self.inlining, self.inline_size,
+                                          self.tail_calls, self.loop_invariants, self.type_inference))
+            run_transpiled(self, nil, key, lambda: self.prepare(program))
+            return
+        main_func_node = self.prepare(program)
+        if self.engine == "closure":
+            compiler = ClosureCompiler(self, nil)
+            compiler.compile_program(self.func_defs)
+            compiler.run_main(main_func_node)
+            return
+        if self.engine == "bytecode":
+            compiler = BytecodeCompiler(self, nil)
+            self.bytecode = compiler.compile_program(self.func_defs)
+            VirtualMachine(self, nil, self.bytecode, self.max_depth).run(compiler.func_index[id(main_func_node)])
+            return
+        if self.engine == "stackless":
+            StacklessEvaluator(self, nil, self.max_depth).run(main_func_node)
+            return
+        if self.tracing:
+            self.tracer = TraceJIT(self, nil, self.hot_loop)
+        self.frame = Frame(main_func_node, None, main_func_node.dict['frame_size'])
+        self.run_frame(main_func_node)
+
+    # parses program and runs all the passes over it, returns main's func node
+    def prepare(self, program):
+        ast = parse_program(program, self.parser) # returns list of function nodes
+        if self.constant_folding:
+            self.folded_nodes = fold_constants(ast)
+        if self.dead_code:
+            self.pruned_nodes = prune_program(ast)
+        if self.inlining:
+            self.inlined = inline_program(ast, self.inline_size)
+        if self.trace_output:
+            print(ast)
+        # bind every variable to a frame slot once, so lookups don't have to search scopes at runtime
+        resolve_program(ast)
         self.func_defs = self.get_func_defs(ast)
+        self.build_func_table()
         main_func_node = self.get_main_func_node(ast)
-        self.run_func(main_func_node)
+        if self.tail_calls:
+            mark_tail_calls(ast, self.func_table)
+        mark_counting_loops(ast)
+        if self.loop_invariants:
+            self.hoisted_nodes = hoist_loop_invariants(ast)
+        if self.type_inference:
+            self.typed_nodes = infer_types(ast, self.func_table)
+        if self.memoize:
+            mark_pure_functions(ast, self.func_table)
+            self.memo = LRUCache(self.memo_size)
+        return main_func_node
 
     # grabs all globally defined functions to call when needed.
     def get_func_defs(self, ast):
         # returns functions sub-dict, 'functions' is key
         return ast.dict['functions']
 
+    # index the functions once so calls don't have to search the whole list.
+    # two functions with the same name AND same number of args is an error (can't tell which to call).
+    def build_func_table(self):
+        self.func_table = {}
+        self.func_names = set()
+        for func in self.func_defs:
+            func_name = func.dict['name']
+            key = (func_name, len(func.dict['args']))
+            if key in self.func_table:
+                super().error(ErrorType.NAME_ERROR,
+                              f"Function {func_name} with {key[1]} parameters defined more than once",
+                              )
+            self.func_table[key] = func
+            self.func_names.add(func_name)
+
     # returns 'main' func node from the dict input.
     def get_main_func_node(self, ast):
         # checks for function whose name is 'main'
@@ -37,26 +202,31 @@ class Interpreter(InterpreterBase):
 
 
     # self explanatory
+    # (self.frame must already be the frame for this function)
     def run_func(self, func_node):
         # statements key for sub-dict.
-        ### BEGIN FUNC SCOPE ###
-        self.variable_scope_stack.append({})
-        
-        return_value = nil
         for statement in func_node.dict['statements']:
-            return_value = self.run_statement(statement)
-            # check if statement results in a return, and return a return statement with 
-            if isinstance(return_value, Element) and return_value.elem_type == "return":
-                # Return the value, dont need to continue returning.
-                self.variable_scope_stack.pop()
-                return return_value.get("value")
-            if return_value is not nil:
-                break
-        
-        ### END FUNC SCOPE ###
-        self.variable_scope_stack.pop()
+            # anything but nil is the return signal, return its value
+            if self.run_statement(statement) is not nil:
+                return self.return_signal.value
+        return nil
+
+    # runs func_node in self.frame. tail calls come back here as TAIL_CALL,
+    # and get run in the same frame instead of a new one (so the python stack doesn't grow either)
+    def run_frame(self, func_node):
+        return_value = self.run_func(func_node)
+        while return_value is TAIL_CALL:
+            func_node, arg_values = self.pending_tail_call
+            self.pending_tail_call = None
+            frame = self.frame
+            frame.func = func_node
+            # params get overwritten, every other slot is always defined (set to None) before it's read
+            if len(frame.locals) != func_node.dict['frame_size']:
+                frame.locals = [None] * func_node.dict['frame_size']
+            frame.locals[:len(arg_values)] = arg_values
+            return_value = self.run_func(func_node)
         return return_value
-    
+
 
     def run_statement(self, statement_node):
         #print(f"Running statement: {statement_node}")
@@ -65,7 +235,12 @@ class Interpreter(InterpreterBase):
         elif self.is_assignment(statement_node):
             self.do_assignment(statement_node)
         elif self.is_func_call(statement_node):
-            return self.do_func_call(statement_node)
+            # a call that gives back something other than nil ends the function
+            return_value = self.do_func_call(statement_node)
+            if return_value is nil:
+                return nil
+            self.return_signal.value = return_value
+            return self.return_signal
         elif self.is_return_statement(statement_node):
             return self.do_return_statement(statement_node)
         elif self.is_if_statement(statement_node):
@@ -91,40 +266,33 @@ class Interpreter(InterpreterBase):
 
 
     def do_definition(self, statement_node):
-        # just add to var_name_to_value dict
-        target_var_name = self.get_target_variable_name(statement_node)
-        # Copilot (+1)
-        if target_var_name in self.variable_scope_stack[-1]:
+        # resolver gives no slot if the name was already defined in this block
+        slot = statement_node.dict['slot']
+        if slot is None:
+            target_var_name = self.get_target_variable_name(statement_node)
             super().error(ErrorType.NAME_ERROR, f"Variable {target_var_name} defined more than once",)
-        else:
-            self.variable_scope_stack[-1][target_var_name] = None
-        
+        # None = declared but not defined yet
+        self.frame.locals[slot] = None
+
 
     def do_assignment(self, statement_node):
-        
-        target_var_name = self.get_target_variable_name(statement_node)
-        # Copilot (+5)
-        for scope in reversed(self.variable_scope_stack): 
-            if target_var_name in scope: 
-                # Does not evaluate until after checking if valid variable
-                source_node = self.get_expression_node(statement_node)
-                resulting_value = self.evaluate_expression(source_node)
-                scope[target_var_name] = resulting_value 
-                return
-        super().error(ErrorType.NAME_ERROR, f"variable used and not declared: {target_var_name}",)
+        slot = statement_node.dict['slot']
+        if slot is None:
+            target_var_name = self.get_target_variable_name(statement_node)
+            super().error(ErrorType.NAME_ERROR, f"variable used and not declared: {target_var_name}",)
+        # Does not evaluate until after checking if valid variable
+        source_node = self.get_expression_node(statement_node)
+        self.frame.locals[slot] = self.evaluate_expression(source_node)
 
     # Check if function is defined
     def check_valid_func(self, func_call):
-        for func in self.func_defs:
-            if func.dict['name'] == func_call:
-                return True
-        return False
+        return func_call in self.func_names
 
-    # Allows function overloading by first searching for func_defs for a matching name and arg length
+    # Allows function overloading by looking up the matching name and arg length
     def get_func_def(self, func_call, arg_len):
-        for func in self.func_defs:
-            if func.dict['name'] == func_call and len(func.dict['args']) == arg_len:
-                return func
+        func = self.func_table.get((func_call, arg_len))
+        if func is not None:
+            return func
         # Already check if func exists before calling
         # So, must not have correct args.
         super().error(ErrorType.NAME_ERROR,
@@ -202,34 +370,51 @@ class Interpreter(InterpreterBase):
             args = statement_node.dict['args'] # passed in arguments
             params = func_def.dict['args'] # function parameters
 
-            processed_args = [{}]
-            # intialize params, and then assign to them each arg in order
-            for i in range(0,len(params)):
-                # define params
-                var_name = params[i].dict['name']
-                processed_args[-1][var_name] = self.evaluate_expression(args[i])
-
-            main_vars = self.variable_scope_stack.copy()
+            if statement_node.dict.get('tail_call'):
+                # args still run in our frame, then run_frame reuses our frame for the callee
+                self.pending_tail_call = (func_def, [self.evaluate_expression(arg) for arg in args])
+                return TAIL_CALL
 
-            # wipe all prev vars except arguments
-            self.variable_scope_stack = processed_args
-            return_value = self.run_func(func_def)
+            # new frame for the callee, params are the first slots (callee can't see our vars)
+            frame = Frame(func_def, self.frame, func_def.dict['frame_size'])
+            processed_args = frame.locals
+            # intialize params, and then assign to them each arg in order (args still run in our frame)
+            for i in range(0,len(params)):
+                processed_args[i] = self.evaluate_expression(args[i])
+
+            # pure function we've already called with these args, no need to run it again
+            memo_key = None
+            if self.memo is not None and 'pure' in func_def.dict:
+                memo_key = make_key(func_def, processed_args[:len(params)])
+                cached = self.memo.get(memo_key)
+                if cached is not MISSING:
+                    return cached
+
+            self.frame = frame
+            return_value = self.run_frame(func_def)
             
             #### END SCOPE ####
-            self.variable_scope_stack = main_vars.copy()
+            self.frame = frame.parent
+            if memo_key is not None:
+                self.memo.put(memo_key, return_value)
             return return_value
                             
             ##### End Function Call ######
     
     def do_return_statement(self, statement_node):
         if not statement_node.dict['expression']:
-            #return 'nil' Element
-            # I had the idea, Copilot (+1) showed me how to assign a val
-            return Element("return", value=nil)
-        return self.evaluate_expression(statement_node.dict['expression'])
+            # `return;` always ends the function, with nil
+            self.return_signal.value = nil
+            return self.return_signal
+        return_value = self.evaluate_expression(statement_node.dict['expression'])
+        # returning a nil value just keeps going (same as before)
+        if return_value is nil:
+            return nil
+        self.return_signal.value = return_value
+        return self.return_signal
 
     # Scope rules: Can access parent calling vars, but vars they create are deleted after scope.
-    # So, keep track of what vars were before, and after end of clause, wipe those variables.
+    # (resolver.py already gave block variables their own slots, so nothing to push/pop here)
     def do_if_statement(self, statement_node):
         condition = statement_node.dict['condition']
         condition = self.evaluate_expression(condition)
@@ -239,68 +424,73 @@ class Interpreter(InterpreterBase):
         statements = statement_node.dict['statements']
         else_statements = statement_node.dict['else_statements']
 
-        ### BEGIN IF SCOPE ###
-        # Copilot (+1)
-        self.variable_scope_stack.append({})
         if condition:
             for statement in statements:
-                return_value = self.run_statement(statement)     
-                if isinstance(return_value, Element) and return_value.elem_type == "return":
-                    #end scope early and return
-                    self.variable_scope_stack.pop()
-                    return Element("return", value=return_value.get("value"))
-                elif return_value is not nil:
-                    self.variable_scope_stack.pop()
-                    return Element("return", value=return_value)
-                    # if return needed, stop running statements, immediately return the value.
+                return_value = self.run_statement(statement)
+                # if return needed, stop running statements, pass the signal up.
+                if return_value is not nil:
+                    return return_value
         else:
             if else_statements:
                 for else_statement in else_statements:
                     return_value = self.run_statement(else_statement)
-                    
-                    if isinstance(return_value, Element) and return_value.elem_type == "return":
-                        #end scope early and return
-                        self.variable_scope_stack.pop()
-                        return Element("return", value=return_value.get("value"))
-                    elif return_value is not nil:
-                        self.variable_scope_stack.pop()
-                        return Element("return", value=return_value)
-        ### END IF SCOPE ###
-
-        # Copilot (+1)
-        self.variable_scope_stack.pop()
+                    if return_value is not nil:
+                        return return_value
         return nil
 
 
     def do_for_loop(self, statement_node):
+        # loops the tracing JIT hasn't given up on go through it (see tracejit.py)
+        if self.tracer is not None and 'no_trace' not in statement_node.dict:
+            return self.tracer.run_loop(statement_node)
+        # hoisted expressions (licm.py) get computed again every time the loop starts
+        temps = statement_node.dict.get('temps')
+        if temps is not None:
+            for slot in temps:
+                self.frame.locals[slot] = None
         # Run initializer
         init_node = statement_node.dict['init']
         self.run_statement(init_node)
         update = statement_node.dict['update']
         condition = statement_node.dict['condition']
         statements = statement_node.dict['statements']
-        
+
+        # for (i = a; i < b; i = i + k) loops (see loops.py) just run i over a python range,
+        # as long as i and b really are ints once the loop starts. otherwise do the normal loop below.
+        counter = statement_node.dict.get('counter')
+        if counter is not None:
+            slot, comparison, step = counter
+            local_vars = self.frame.locals
+            start = local_vars[slot]
+            if type(start) is int:
+                bound = self.evaluate_expression(condition.dict['op2'])
+                if type(bound) is int:
+                    values = counter_range(start, comparison, bound, step)
+                    for i in values:
+                        local_vars[slot] = i
+                        for statement in statements:
+                            return_value = self.run_statement(statement)
+                            if return_value is not nil:
+                                return return_value
+                    # i ends up one step past the last value, same as after the last update
+                    if values:
+                        local_vars[slot] = values[-1] + step
+                    return nil
+
         # Run the loop again (exits on condition false)
-        while self.evaluate_expression(condition):
-            if type(self.evaluate_expression(condition)) is not bool:
+        while True:
+            # condition is evaluated exactly once per iteration, and has to be a bool
+            result = self.evaluate_expression(condition)
+            if type(result) is not bool:
                 super().error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
-            
-            ### BEGIN VAR SCOPE ###
-            self.variable_scope_stack.append({})
+            if not result:
+                break
 
             for statement in statements:
                 return_value = self.run_statement(statement)
                 # if return keyword
-                if isinstance(return_value, Element) and return_value.elem_type == "return":
-
-                    #end scope early and return
-                    self.variable_scope_stack.pop()
-                    return Element("return", value=return_value.get("value"))
-                elif return_value is not nil:
-                    return Element("return", value=return_value)
-
-            ### END VAR SCOPE ###
-            self.variable_scope_stack.pop()
+                if return_value is not nil:
+                    return return_value
 
             self.run_statement(update)
         return nil
@@ -330,6 +520,11 @@ class Interpreter(InterpreterBase):
 
     # basically pseudcode, self-explanatory
     def evaluate_expression(self, expression_node):
+        # operator nodes specialized by quicken.py (only with quickening on)
+        if expression_node.elem_type in QUICKENED:
+            return self.evaluate_quickened_operator(expression_node)
+        if expression_node.elem_type == HOISTED_NODE:
+            return self.get_hoisted_value(expression_node)
         if self.is_value_node(expression_node):
             return self.get_value(expression_node)
         elif self.is_variable_node(expression_node):
@@ -344,6 +539,23 @@ class Interpreter(InterpreterBase):
             return self.evaluate_binary_boolean_operator(expression_node)
         elif self.is_func_call(expression_node):
             return self.do_func_call(expression_node)
+        elif expression_node.elem_type == INLINE_NODE:
+            return self.do_inline(expression_node)
+
+    # inlined call (see inliner.py): args go into their slots in our frame, then the func's expression runs
+    def do_inline(self, expression_node):
+        for slot, arg in zip(expression_node.dict['slots'], expression_node.dict['args']):
+            self.frame.locals[slot] = self.evaluate_expression(arg)
+        return self.evaluate_expression(expression_node.dict['expression'])
+
+    # loop-invariant expression (see licm.py): computed the first time the loop gets here, then reused
+    def get_hoisted_value(self, expression_node):
+        local_vars = self.frame.locals
+        slot = expression_node.dict['slot']
+        val = local_vars[slot]
+        if val is None:
+            val = local_vars[slot] = self.evaluate_expression(expression_node.dict['expression'])
+        return val
 
     def get_value(self, expression_node):
         # Returns value assigned to key 'val'
@@ -357,67 +569,94 @@ class Interpreter(InterpreterBase):
         if expression_node == 'nil':
             return nil
         
-        # Copilot (+4)
-        var_name = expression_node.dict['name']
-        for scope in reversed(self.variable_scope_stack): 
-            if var_name in scope: 
-                val = scope[var_name] 
-                if val is None:
-                    super().error(ErrorType.NAME_ERROR, f"variable '{var_name}' declared but not defined",)
-                else: 
-                    return val 
+        slot = expression_node.dict['slot']
         # if varname not found
-        super().error(ErrorType.NAME_ERROR, f"variable '{var_name}' used and not declared",)
+        if slot is None:
+            var_name = expression_node.dict['name']
+            super().error(ErrorType.NAME_ERROR, f"variable '{var_name}' used and not declared",)
+        val = self.frame.locals[slot]
+        if val is None:
+            var_name = expression_node.dict['name']
+            super().error(ErrorType.NAME_ERROR, f"variable '{var_name}' declared but not defined",)
+        return val
 
 
     # + or -
     def evaluate_binary_operator(self, expression_node):
         # can *only* be +, -, *, / for now.
 
+        # read before the operands run, a call in there can quicken this same node
+        kind = expression_node.elem_type
         eval1 = self.evaluate_expression(expression_node.dict['op1'])
         eval2 = self.evaluate_expression(expression_node.dict['op2'])
+        # types already known to be right (typeinfer.py), no checks needed
+        if 'typed' in expression_node.dict:
+            return OPERATORS[kind](eval1, eval2)
+        if self.quickening:
+            record_types(expression_node, eval1, eval2)
+        return self.apply_binary_operator(kind, eval1, eval2)
+
+    # the checks + the actual operation, once the operands are evaluated
+    def apply_binary_operator(self, kind, eval1, eval2):
         # for all operators other than + (for concat), both must be of type 'int'
-        if (expression_node.elem_type != "+") and not (type(eval1) == int and type(eval2) == int):
+        if (kind != "+") and not (type(eval1) == int and type(eval2) == int):
             super().error(ErrorType.TYPE_ERROR, "Arguments must be of type 'int'.",)
         # note, the line below looked like above 'isinstance' but i just made it this because instance was bugging (probably just had bad () lol)
        
-        if (expression_node.elem_type == "+") and not ((type(eval1) == int and type(eval2) == int) or (type(eval1) == str and type(eval2) == str)):
+        if (kind == "+") and not ((type(eval1) == int and type(eval2) == int) or (type(eval1) == str and type(eval2) == str)):
             super().error(ErrorType.TYPE_ERROR, "Types for + must be both of type int or string.",)
             
-        if expression_node.elem_type == "+":
+        if kind == "+":
             return (eval1 + eval2)
-        elif expression_node.elem_type == "-":
+        elif kind == "-":
             return (eval1 - eval2)
-        elif expression_node.elem_type == "*":
+        elif kind == "*":
             return (eval1 * eval2)
-        elif expression_node.elem_type == "/":
+        elif kind == "/":
             # integer division
             return (eval1 // eval2)
 
 
     def evaluate_unary_operator(self, expression_node):
         # can be 'neg' (-b) or  '!' for boolean
+        # read before the operands run, a call in there can quicken this same node
+        kind = expression_node.elem_type
         eval = self.evaluate_expression(expression_node.dict['op1'])
-        if expression_node.elem_type == "neg":
+        if 'typed' in expression_node.dict:
+            return OPERATORS[kind](eval)
+        if self.quickening:
+            record_types(expression_node, eval)
+        return self.apply_unary_operator(kind, eval)
+
+    def apply_unary_operator(self, kind, eval):
+        if kind == "neg":
             if not (type(eval) == int):
                 super().error(ErrorType.TYPE_ERROR, "'negation' can only be used on integer values.",)
             return -(eval)
-        if expression_node.elem_type == "!":
+        if kind == "!":
             if not (type(eval) == bool):
                 super().error(ErrorType.TYPE_ERROR, "'Not' can only be used on boolean values.",)
             return not (eval)
         
     # there's probably a better way to do this but oh well
     def evaluate_comparison_operator(self, expression_node):
+        # read before the operands run, a call in there can quicken this same node
+        kind = expression_node.elem_type
         eval1 = self.evaluate_expression(expression_node.dict['op1'])
         eval2 = self.evaluate_expression(expression_node.dict['op2'])
+        if 'typed' in expression_node.dict:
+            return OPERATORS[kind](eval1, eval2)
+        if self.quickening:
+            record_types(expression_node, eval1, eval2)
+        return self.apply_comparison_operator(kind, eval1, eval2)
 
+    def apply_comparison_operator(self, kind, eval1, eval2):
         # != and == can compare different types.
         #self.output(f"eval1: {eval1} eval2: {eval2}")
-        if (expression_node.elem_type not in ["!=", "=="]) and not (type(eval1) == int and type(eval2) == int):
-            super().error(ErrorType.TYPE_ERROR, f"Comparison args for {expression_node.elem_type} must be of same type int.",)
+        if (kind not in ["!=", "=="]) and not (type(eval1) == int and type(eval2) == int):
+            super().error(ErrorType.TYPE_ERROR, f"Comparison args for {kind} must be of same type int.",)
         
-        match expression_node.elem_type:
+        match kind:
             case '<':
                 return (eval1 < eval2)
             case '<=':
@@ -438,19 +677,48 @@ class Interpreter(InterpreterBase):
                     return (eval1 != eval2)
     
     def evaluate_binary_boolean_operator(self, expression_node):
+        # read before the operands run, a call in there can quicken this same node
+        kind = expression_node.elem_type
         eval1 = self.evaluate_expression(expression_node.dict['op1'])
         eval2 = self.evaluate_expression(expression_node.dict['op2'])
+        if 'typed' in expression_node.dict:
+            return OPERATORS[kind](eval1, eval2)
+        if self.quickening:
+            record_types(expression_node, eval1, eval2)
+        return self.apply_binary_boolean_operator(kind, eval1, eval2)
+
+    def apply_binary_boolean_operator(self, kind, eval1, eval2):
         if (type(eval1) is not bool) or (type(eval2) is not bool):
-            super().error(ErrorType.TYPE_ERROR, f"Comparison args for {expression_node.elem_type} must be of same type bool.",)
+            super().error(ErrorType.TYPE_ERROR, f"Comparison args for {kind} must be of same type bool.",)
         # forces evaluation on both (strict evaluation)
         eval1 = bool(eval1)
         eval2 = bool(eval2)
 
-        match expression_node.elem_type:
+        match kind:
             case '&&':
                 return (eval1 and eval2)
             case '||':
                 return (eval1 or eval2)
+
+    # specialized node from quicken.py: same operation, but the checks are just a guard on the operand types.
+    # if the guard fails the node goes back to normal and the normal checks run on the values we already have.
+    def evaluate_quickened_operator(self, expression_node):
+        function, value_type, kind = QUICKENED[expression_node.elem_type]
+        eval1 = self.evaluate_expression(expression_node.dict['op1'])
+        if kind in UNARY_KINDS:
+            if type(eval1) is value_type:
+                return function(eval1)
+            despecialize(expression_node)
+            return self.apply_unary_operator(kind, eval1)
+        eval2 = self.evaluate_expression(expression_node.dict['op2'])
+        if type(eval1) is value_type and type(eval2) is value_type:
+            return function(eval1, eval2)
+        despecialize(expression_node)
+        if self.is_binary_operator(expression_node):
+            return self.apply_binary_operator(kind, eval1, eval2)
+        if self.is_binary_boolean_operator(expression_node):
+            return self.apply_binary_boolean_operator(kind, eval1, eval2)
+        return self.apply_comparison_operator(kind, eval1, eval2)
     
     # No more functions remain... for now... :)
 
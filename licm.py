@@ -0,0 +1,170 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Loop-invariant code motion: expressions inside a for loop (condition, update or body) that only use literals,
+# operators and variables the loop never assigns get the same value every time around. Each one gets a temporary
+# (an extra slot in the func's frame) and is only computed once per run of the loop.
+# Needs resolver.py to have run, the variables are checked by slot like in loops.py.
+#
+# "Assigned in the loop" counts `=` and `var` anywhere in the condition/update/body (a `var x;` in the body gives x
+# a new, undefined value every iteration) and params of inlined calls (inliner.py). Calls are never hoisted, called
+# functions can't change our variables anyway. Stuff in the loop's init is fine, it runs before everything else.
+#
+# The temporary isn't filled in before the loop starts: the expression still runs at the first place the loop
+# would have run it, and the value is saved for next time. So if it errors (type error, undefined variable,
+# division by 0) it errors at the same point with the same output before it, and a loop that never runs (or never
+# reaches it) never runs it. Every time the loop statement starts over its temporaries are emptied again.
+#
+# What it writes into the nodes:
+#   hoisted -> 'slot': the temporary (None until computed), 'expression': the expression it replaced
+#   for     -> 'temps': temporaries to empty when the loop starts
+#   func    -> 'frame_size' goes up by one for every temporary
+
+from intbase import InterpreterBase
+from element import Element
+from inliner import INLINE_NODE
+
+HOISTED_NODE = "hoisted"
+LITERALS = (InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE, InterpreterBase.BOOL_NODE,
+            InterpreterBase.NIL_NODE)
+
+
+class LoopHoister:
+    def __init__(self, func_node):
+        self.func = func_node
+        self.count = 0
+        # slots assigned in the loop being worked on, and its temporaries
+        self.assigned = set()
+        self.temps = []
+
+    # finds the for loops in a block (including in ifs)
+    def hoist_block(self, statements):
+        for statement in statements or ():
+            if statement.elem_type == InterpreterBase.IF_NODE:
+                self.hoist_block(statement.dict['statements'])
+                self.hoist_block(statement.dict['else_statements'])
+            elif statement.elem_type == InterpreterBase.FOR_NODE:
+                self.hoist_loop(statement)
+
+    def hoist_loop(self, for_node):
+        self.assigned = set()
+        find_assigned_in_statement(for_node.dict['update'], self.assigned)
+        find_assigned_in_expression(for_node.dict['condition'], self.assigned)
+        find_assigned(for_node.dict['statements'], self.assigned)
+        self.temps = []
+        for_node.dict['condition'] = self.hoist_expression(for_node.dict['condition'])
+        self.hoist_statement(for_node.dict['update'])
+        self.hoist_statements(for_node.dict['statements'])
+        if self.temps:
+            for_node.dict['temps'] = self.temps
+        # loops inside this one: what's left might still be invariant in there
+        self.hoist_block(for_node.dict['statements'])
+
+    def hoist_statements(self, statements):
+        for statement in statements or ():
+            self.hoist_statement(statement)
+
+    def hoist_statement(self, statement_node):
+        kind = statement_node.elem_type
+        if kind == "=" or kind == InterpreterBase.RETURN_NODE:
+            if statement_node.dict['expression'] is not None:
+                statement_node.dict['expression'] = self.hoist_expression(statement_node.dict['expression'])
+        elif kind == InterpreterBase.FCALL_NODE:
+            self.hoist_args(statement_node)
+        elif kind == InterpreterBase.IF_NODE:
+            statement_node.dict['condition'] = self.hoist_expression(statement_node.dict['condition'])
+            self.hoist_statements(statement_node.dict['statements'])
+            self.hoist_statements(statement_node.dict['else_statements'])
+        elif kind == InterpreterBase.FOR_NODE:
+            self.hoist_statement(statement_node.dict['init'])
+            statement_node.dict['condition'] = self.hoist_expression(statement_node.dict['condition'])
+            self.hoist_statement(statement_node.dict['update'])
+            self.hoist_statements(statement_node.dict['statements'])
+
+    def hoist_args(self, node):
+        args = node.dict['args']
+        for i in range(len(args)):
+            args[i] = self.hoist_expression(args[i])
+
+    # returns the node to use instead of expression_node
+    def hoist_expression(self, expression_node):
+        kind = expression_node.elem_type
+        if kind == HOISTED_NODE:
+            return expression_node
+        # a lone variable or literal is already as cheap as reading a temporary
+        if 'op1' in expression_node.dict and self.is_invariant(expression_node):
+            slot = self.func.dict['frame_size']
+            self.func.dict['frame_size'] += 1
+            self.temps.append(slot)
+            self.count += 1
+            return Element(HOISTED_NODE, slot=slot, expression=expression_node)
+        if kind == InterpreterBase.FCALL_NODE or kind == INLINE_NODE:
+            self.hoist_args(expression_node)
+        if kind == INLINE_NODE:
+            expression_node.dict['expression'] = self.hoist_expression(expression_node.dict['expression'])
+        for key in ('op1', 'op2'):
+            if key in expression_node.dict:
+                expression_node.dict[key] = self.hoist_expression(expression_node.dict[key])
+        return expression_node
+
+    def is_invariant(self, expression_node):
+        kind = expression_node.elem_type
+        if kind in LITERALS:
+            return True
+        if kind == InterpreterBase.VAR_NODE:
+            slot = expression_node.dict['slot']
+            return slot is not None and slot not in self.assigned
+        if 'op1' not in expression_node.dict:
+            # calls, inlined calls, and things already hoisted
+            return False
+        if not self.is_invariant(expression_node.dict['op1']):
+            return False
+        return 'op2' not in expression_node.dict or self.is_invariant(expression_node.dict['op2'])
+
+
+# adds every slot written anywhere in statements (including nested blocks and loops) to assigned
+def find_assigned(statements, assigned):
+    for statement in statements or ():
+        find_assigned_in_statement(statement, assigned)
+
+
+def find_assigned_in_statement(statement_node, assigned):
+    kind = statement_node.elem_type
+    if kind == "=" or kind == InterpreterBase.VAR_DEF_NODE:
+        assigned.add(statement_node.dict['slot'])
+    if kind == "=" or kind == InterpreterBase.RETURN_NODE:
+        if statement_node.dict['expression'] is not None:
+            find_assigned_in_expression(statement_node.dict['expression'], assigned)
+    elif kind == InterpreterBase.FCALL_NODE:
+        find_assigned_in_expression(statement_node, assigned)
+    elif kind == InterpreterBase.IF_NODE:
+        find_assigned_in_expression(statement_node.dict['condition'], assigned)
+        find_assigned(statement_node.dict['statements'], assigned)
+        find_assigned(statement_node.dict['else_statements'], assigned)
+    elif kind == InterpreterBase.FOR_NODE:
+        find_assigned_in_statement(statement_node.dict['init'], assigned)
+        find_assigned_in_expression(statement_node.dict['condition'], assigned)
+        find_assigned_in_statement(statement_node.dict['update'], assigned)
+        find_assigned(statement_node.dict['statements'], assigned)
+
+
+# only inlined calls write slots in the middle of an expression
+def find_assigned_in_expression(expression_node, assigned):
+    if expression_node.elem_type == INLINE_NODE:
+        assigned.update(expression_node.dict['slots'])
+        find_assigned_in_expression(expression_node.dict['expression'], assigned)
+    for arg in expression_node.dict.get('args', ()):
+        find_assigned_in_expression(arg, assigned)
+    for key in ('op1', 'op2'):
+        if key in expression_node.dict:
+            find_assigned_in_expression(expression_node.dict[key], assigned)
+
+
+# exported function, returns how many expressions got hoisted
+def hoist_loop_invariants(ast):
+    count = 0
+    for func in ast.dict['functions']:
+        hoister = LoopHoister(func)
+        hoister.hoist_block(func.dict['statements'])
+        count += hoister.count
+    return count
@@ -0,0 +1,111 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Finds plain counting loops so the engines can run them on a python range instead of doing the full
+# condition + update statements every iteration:
+#
+#   for (i = <anything>; i < b; i = i + k) { ...body never assigns i or b... }
+#
+# where b is an int literal or a variable, k is an int literal, and the comparison is <, <=, > or >=
+# (k > 0 for < / <=, k < 0 for > / >=, so the loop actually moves toward the bound).
+# Needs resolver.py to have run: "never assigns i or b" is checked by slot, so a `var i;` inside the body
+# (which is a different variable) doesn't count. Called functions can't touch our variables anyway.
+#
+# Matching for nodes get 'counter': (slot of i, comparison, step).
+# The engines still check at runtime that i and b are ints when the loop starts, and use the normal loop otherwise.
+
+from intbase import InterpreterBase
+
+COMPARISONS = ('<', '<=', '>', '>=')
+
+
+def mark_counting_loops(ast):
+    count = 0
+    for func in ast.dict['functions']:
+        count += mark_statements(func.dict['statements'])
+    return count
+
+
+def mark_statements(statements):
+    count = 0
+    for statement in statements or ():
+        if statement.elem_type == InterpreterBase.IF_NODE:
+            count += mark_statements(statement.dict['statements'])
+            count += mark_statements(statement.dict['else_statements'])
+        elif statement.elem_type == InterpreterBase.FOR_NODE:
+            count += mark_statements(statement.dict['statements'])
+            counter = get_counter(statement)
+            if counter is not None:
+                statement.dict['counter'] = counter
+                count += 1
+    return count
+
+
+# returns (slot, comparison, step) if for_node is a counting loop, otherwise None
+def get_counter(for_node):
+    init = for_node.dict['init']
+    condition = for_node.dict['condition']
+    update = for_node.dict['update']
+    slot = init.dict['slot']
+    if slot is None:
+        return None
+
+    # i < b
+    if condition.elem_type not in COMPARISONS or not is_var(condition.dict['op1'], slot):
+        return None
+    bound = condition.dict['op2']
+    if bound.elem_type == InterpreterBase.VAR_NODE:
+        bound_slot = bound.dict['slot']
+        if bound_slot is None or bound_slot == slot:
+            return None
+    elif bound.elem_type == InterpreterBase.INT_NODE:
+        bound_slot = None
+    else:
+        return None
+
+    # i = i + k  or  i = i - k
+    step_node = update.dict['expression']
+    if update.dict['slot'] != slot or step_node.elem_type not in ('+', '-'):
+        return None
+    if not is_var(step_node.dict['op1'], slot) or step_node.dict['op2'].elem_type != InterpreterBase.INT_NODE:
+        return None
+    step = step_node.dict['op2'].dict['val']
+    if step_node.elem_type == '-':
+        step = -step
+    if condition.elem_type in ('<', '<=') and step <= 0:
+        return None
+    if condition.elem_type in ('>', '>=') and step >= 0:
+        return None
+
+    assigned = set()
+    find_assigned_slots(for_node.dict['statements'], assigned)
+    if slot in assigned or (bound_slot is not None and bound_slot in assigned):
+        return None
+    return (slot, condition.elem_type, step)
+
+
+def is_var(node, slot):
+    return node.elem_type == InterpreterBase.VAR_NODE and node.dict['slot'] == slot
+
+
+# adds every slot assigned anywhere in statements (including nested blocks and loops) to assigned
+def find_assigned_slots(statements, assigned):
+    for statement in statements or ():
+        kind = statement.elem_type
+        if kind == "=":
+            assigned.add(statement.dict['slot'])
+        elif kind == InterpreterBase.IF_NODE:
+            find_assigned_slots(statement.dict['statements'], assigned)
+            find_assigned_slots(statement.dict['else_statements'], assigned)
+        elif kind == InterpreterBase.FOR_NODE:
+            find_assigned_slots([statement.dict['init'], statement.dict['update']], assigned)
+            find_assigned_slots(statement.dict['statements'], assigned)
+
+
+# python range that gives the same values of i as the loop would (step/comparison already checked)
+def counter_range(start, comparison, bound, step):
+    if comparison == '<=':
+        bound += 1
+    elif comparison == '>=':
+        bound -= 1
+    return range(start, bound, step)
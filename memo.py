@@ -0,0 +1,39 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# LRU cache for the results of pure functions (see purity.py), used by Interpreter(memoize=True).
+# Keys are (func node, arg values). Each arg goes in with its type, since python thinks 1 == True
+# but Brewin doesn't.
+
+from collections import OrderedDict
+
+# returned by get() when the key isn't cached (nil or anything else could be a real cached value)
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            # least recently used one goes
+            self.entries.popitem(last=False)
+
+
+def make_key(func_node, arg_values):
+    return (func_node,) + tuple((type(value), value) for value in arg_values)
@@ -0,0 +1,50 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Purity analysis: a user function is pure if running it can't print or read input, directly or through any
+# function it calls. Brewin functions can't see their caller's variables and there's nothing global, so a
+# pure function's result only depends on its arguments (which is what memo.py needs to cache it).
+# Erroring is fine, errors just aren't cached.
+#
+# Pure func nodes get 'pure': True.
+
+from deadcode import find_calls
+
+IO_FUNCS = ("print", "inputi", "inputs")
+
+
+# exported function, returns how many functions are pure
+def mark_pure_functions(ast, func_table):
+    functions = ast.dict['functions']
+    # func node -> user funcs it calls
+    calls = {}
+    impure = set()
+    for func in functions:
+        call_nodes = []
+        find_calls(func.dict['statements'], call_nodes)
+        calls[func] = []
+        for call in call_nodes:
+            key = (call.dict['name'], len(call.dict['args']))
+            if key[0] in IO_FUNCS:
+                impure.add(func)
+            elif key in func_table:
+                calls[func].append(func_table[key])
+
+    # anything that calls an impure function is impure too
+    changed = True
+    while changed:
+        changed = False
+        for func in functions:
+            if func not in impure and any(callee in impure for callee in calls[func]):
+                impure.add(func)
+                changed = True
+
+    count = 0
+    for func in functions:
+        if func in impure:
+            func.dict.pop('pure', None)
+        else:
+            func.dict['pure'] = True
+            count += 1
+    return count
+
@@ -0,0 +1,74 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Quickening for the tree walker (Interpreter(quickening=True)): operator nodes specialize themselves at runtime.
+#
+# Every time a generic operator node runs, record_types() remembers the types of its operands. Once it has seen
+# the same types QUICKEN_AFTER times in a row (and they're types the operator accepts), the node's elem_type is
+# swapped for a specialized kind like "+:int". evaluate_quickened_operator in interpreterv2 runs those with just a
+# type guard instead of the full checks. If the guard ever fails the node goes back to its generic kind
+# (despecialize) and the normal checks run, so errors are the same as before.
+# A node that keeps failing its guard (MAX_DEOPTS times) stays generic for good.
+
+import operator
+
+from intbase import InterpreterBase
+
+QUICKEN_AFTER = 8
+MAX_DEOPTS = 4
+
+UNARY_KINDS = (InterpreterBase.NEG_NODE, InterpreterBase.NOT_NODE)
+
+# (operator, operand type) -> specialized kind
+SPECIALIZATIONS = {}
+# specialized kind -> (function, type the operands must have, generic kind)
+QUICKENED = {}
+
+
+def add_specialization(kind, value_type, function):
+    quickened_kind = f"{kind}:{value_type.__name__}"
+    SPECIALIZATIONS[(kind, value_type)] = quickened_kind
+    QUICKENED[quickened_kind] = (function, value_type, kind)
+
+
+for kind, function in (('+', operator.add), ('-', operator.sub), ('*', operator.mul), ('/', operator.floordiv),
+                       ('<', operator.lt), ('<=', operator.le), ('>', operator.gt), ('>=', operator.ge),
+                       ('==', operator.eq), ('!=', operator.ne), (InterpreterBase.NEG_NODE, operator.neg)):
+    add_specialization(kind, int, function)
+for kind, function in (('+', operator.add), ('==', operator.eq), ('!=', operator.ne)):
+    add_specialization(kind, str, function)
+for kind, function in (('&&', operator.and_), ('||', operator.or_), ('==', operator.eq), ('!=', operator.ne),
+                       (InterpreterBase.NOT_NODE, operator.not_)):
+    add_specialization(kind, bool, function)
+
+
+# called by the generic evaluate_* methods with the operand values (eval2 left out for unary operators).
+# the node might already be quickened if a call in one of its operands ran it, then there's nothing to do.
+def record_types(expression_node, eval1, eval2=None):
+    if expression_node.elem_type in QUICKENED:
+        return
+    value_type = type(eval1)
+    if eval2 is not None and type(eval2) is not value_type:
+        expression_node.dict.pop('seen', None)
+        return
+    seen = expression_node.dict.get('seen')
+    if seen is None or seen[0] is not value_type:
+        expression_node.dict['seen'] = [value_type, 1]
+        return
+    seen[1] += 1
+    if seen[1] < QUICKEN_AFTER:
+        return
+    quickened_kind = SPECIALIZATIONS.get((expression_node.elem_type, value_type))
+    if quickened_kind is None or expression_node.dict.get('deopts', 0) >= MAX_DEOPTS:
+        return
+    expression_node.dict['generic'] = expression_node.elem_type
+    expression_node.elem_type = quickened_kind
+
+
+# guard failed: turn the node back into its generic kind (unless a call in an operand already did)
+def despecialize(expression_node):
+    if expression_node.elem_type not in QUICKENED:
+        return
+    expression_node.elem_type = expression_node.dict['generic']
+    expression_node.dict['deopts'] = expression_node.dict.get('deopts', 0) + 1
+    expression_node.dict.pop('seen', None)
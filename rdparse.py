@@ -0,0 +1,308 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Hand-written parser for the grammar in brewparse.py: recursive descent for everything down to expressions, and
+# precedence climbing for expressions (with the same precedence table). It builds exactly the same Element trees as
+# the ply parser, it just skips ply's generic LR loop (a YaccProduction and a YaccSymbol for every reduction and a
+# python call for every grammar rule, even the ones like `variable : NAME` that don't do anything).
+#
+# Syntax errors come out the same as ply's too: the error function gets the same token (None at the end of the
+# input), then that token gets thrown away and parsing starts over at the next one, so whatever comes after can
+# still come back as a program. Like ply, errors less than 3 tokens after the last one don't get reported.
+# The one difference is that expressions nested a few hundred deep hit python's recursion limit here.
+#
+# Use it through brewparse.parse_program(program, parser="descent").
+
+from element import Element
+from intbase import InterpreterBase
+from brewlex import Token, tokenize
+
+# binary operator token -> precedence (from brewparse.precedence), higher binds tighter, all left associative.
+# the unary operators bind tighter than all of them
+BINARY_OPERATORS = {
+    "OR": 1,
+    "AND": 2,
+    "GREATER_EQ": 3,
+    "GREATER": 3,
+    "LESS_EQ": 3,
+    "LESS": 3,
+    "EQ": 3,
+    "NOT_EQ": 3,
+    "PLUS": 4,
+    "MINUS": 4,
+    "MULTIPLY": 5,
+    "DIVIDE": 5,
+}
+
+END = "$end"
+END_TOKEN = (END, None, 0)
+
+
+# the current token can't go here
+class BadToken(Exception):
+    pass
+
+
+class DescentParser:
+    # error_func gets called like ply's p_error
+    def __init__(self, error_func):
+        self.error_func = error_func
+        # where the rest of the tokens come from (brewlex.tokenize)
+        self.tokens = iter(())
+        # the current token (END at the end of the input)
+        self.type = END
+        self.value = None
+        self.line = 0
+        # how many tokens have been used up so far
+        self.position = 0
+
+    # same as ply's LRParser.parse: the program node, or None if it couldn't find one
+    def parse(self, program):
+        self.tokens = tokenize(program)
+        self.position = 0
+        self.advance()
+        last_error = None
+        while True:
+            try:
+                return self.program()
+            except BadToken:
+                pass
+            if last_error is None or self.position - last_error >= 3:
+                self.error_func(None if self.type == END else Token(self.type, self.value, self.line))
+            if self.type == END:
+                return None
+            # throw the bad token away and start over (the throwing away doesn't count as using it)
+            self.advance()
+            last_error = self.position
+
+    # returns the current token's value and moves on to the next token
+    def advance(self):
+        value = self.value
+        self.type, self.value, self.line = next(self.tokens, END_TOKEN)
+        self.position += 1
+        return value
+
+    def expect(self, token_type):
+        if self.type != token_type:
+            raise BadToken()
+        return self.advance()
+
+    def program(self):
+        structs = []
+        while self.type == "STRUCT":
+            structs.append(self.struct())
+        functions = [self.func()]
+        while self.type == "FUNC":
+            functions.append(self.func())
+        if self.type != END:
+            raise BadToken()
+        return Element(InterpreterBase.PROGRAM_NODE, structs=structs, functions=functions)
+
+    def struct(self):
+        self.advance()
+        name = self.expect("NAME")
+        self.expect("LBRACE")
+        fields = [self.field()]
+        while self.type != "RBRACE":
+            fields.append(self.field())
+        self.advance()
+        return Element(InterpreterBase.STRUCT_NODE, name=name, fields=fields)
+
+    def field(self):
+        name = self.expect("NAME")
+        self.expect("COLON")
+        var_type = self.expect("NAME")
+        self.expect("SEMI")
+        return Element(InterpreterBase.FIELD_DEF_NODE, name=name, var_type=var_type)
+
+    def func(self):
+        self.expect("FUNC")
+        name = self.expect("NAME")
+        self.expect("LPAREN")
+        args = []
+        if self.type != "RPAREN":
+            args.append(self.formal_arg())
+            while self.type == "COMMA":
+                self.advance()
+                args.append(self.formal_arg())
+        self.expect("RPAREN")
+        return_type = None
+        if self.type == "COLON":
+            self.advance()
+            return_type = self.expect("NAME")
+        self.expect("LBRACE")
+        statements = self.statements()
+        return Element(InterpreterBase.FUNC_NODE, name=name, args=args, return_type=return_type,
+                       statements=statements)
+
+    def formal_arg(self):
+        name = self.expect("NAME")
+        var_type = None
+        if self.type == "COLON":
+            self.advance()
+            var_type = self.expect("NAME")
+        return Element(InterpreterBase.ARG_NODE, name=name, var_type=var_type)
+
+    # one or more statements and the closing brace
+    def statements(self):
+        statements = [self.statement()]
+        while self.type != "RBRACE":
+            statements.append(self.statement())
+        self.advance()
+        return statements
+
+    def statement(self):
+        token_type = self.type
+        if token_type == "NAME":
+            name = self.advance()
+            if self.type == "LPAREN":
+                expression = self.binary(self.call(name), 1)
+            else:
+                name = self.dotted_name(name)
+                if self.type == "ASSIGN":
+                    self.advance()
+                    expression = Element("=", name=name, expression=self.expression(1))
+                else:
+                    expression = self.binary(Element(InterpreterBase.VAR_NODE, name=name), 1)
+            self.expect("SEMI")
+            return expression
+        if token_type == "IF":
+            self.advance()
+            self.expect("LPAREN")
+            condition = self.expression(1)
+            self.expect("RPAREN")
+            self.expect("LBRACE")
+            statements = self.statements()
+            else_statements = None
+            if self.type == "ELSE":
+                self.advance()
+                self.expect("LBRACE")
+                else_statements = self.statements()
+            return Element(InterpreterBase.IF_NODE, condition=condition, statements=statements,
+                           else_statements=else_statements)
+        if token_type == "FOR":
+            self.advance()
+            self.expect("LPAREN")
+            init = self.assign()
+            self.expect("SEMI")
+            condition = self.expression(1)
+            self.expect("SEMI")
+            update = self.assign()
+            self.expect("RPAREN")
+            self.expect("LBRACE")
+            statements = self.statements()
+            return Element(InterpreterBase.FOR_NODE, init=init, condition=condition, update=update,
+                           statements=statements)
+        if token_type == "RETURN":
+            self.advance()
+            expression = None
+            if self.type != "SEMI":
+                expression = self.expression(1)
+            self.expect("SEMI")
+            return Element(InterpreterBase.RETURN_NODE, expression=expression)
+        if token_type == "VAR":
+            self.advance()
+            name = self.expect("NAME")
+            var_type = None
+            if self.type == "COLON":
+                self.advance()
+                var_type = self.expect("NAME")
+            self.expect("SEMI")
+            return Element(InterpreterBase.VAR_DEF_NODE, name=name, var_type=var_type)
+        if token_type == "TRY":
+            self.advance()
+            self.expect("LBRACE")
+            statements = self.statements()
+            catchers = [self.catch()]
+            while self.type == "CATCH":
+                catchers.append(self.catch())
+            return Element(InterpreterBase.TRY_NODE, statements=statements, catchers=catchers)
+        if token_type == "RAISE":
+            self.advance()
+            exception_type = self.expression(1)
+            self.expect("SEMI")
+            return Element(InterpreterBase.RAISE_NODE, exception_type=exception_type)
+        expression = self.expression(1)
+        self.expect("SEMI")
+        return expression
+
+    def catch(self):
+        self.expect("CATCH")
+        exception_type = self.expect("STRING")
+        self.expect("LBRACE")
+        statements = self.statements()
+        return Element(InterpreterBase.CATCH_NODE, exception_type=exception_type, statements=statements)
+
+    # for loop init/update
+    def assign(self):
+        name = self.dotted_name(self.expect("NAME"))
+        self.expect("ASSIGN")
+        return Element("=", name=name, expression=self.expression(1))
+
+    # variable_w_dot after its first NAME (any DOT token joins with ".", whatever character it matched)
+    def dotted_name(self, name):
+        while self.type == "DOT":
+            self.advance()
+            name = name + "." + self.expect("NAME")
+        return name
+
+    # an expression whose binary operators all have precedence >= level
+    def expression(self, level):
+        left = self.unary()
+        # most expressions don't have a binary operator after them at all
+        if self.type not in BINARY_OPERATORS:
+            return left
+        return self.binary(left, level)
+
+    # keeps adding binary operators with precedence >= level to the right of left
+    def binary(self, left, level):
+        while True:
+            operator_level = BINARY_OPERATORS.get(self.type)
+            if operator_level is None or operator_level < level:
+                return left
+            operator = self.advance()
+            left = Element(operator, op1=left, op2=self.expression(operator_level + 1))
+
+    def unary(self):
+        token_type = self.type
+        if token_type == "NAME":
+            name = self.advance()
+            if self.type == "LPAREN":
+                return self.call(name)
+            return Element(InterpreterBase.VAR_NODE, name=self.dotted_name(name))
+        if token_type == "NUMBER":
+            return Element(InterpreterBase.INT_NODE, val=self.advance())
+        if token_type == "STRING":
+            return Element(InterpreterBase.STRING_NODE, val=self.advance())
+        if token_type == "LPAREN":
+            self.advance()
+            expression = self.expression(1)
+            self.expect("RPAREN")
+            return expression
+        if token_type == "MINUS":
+            self.advance()
+            return Element(InterpreterBase.NEG_NODE, op1=self.unary())
+        if token_type == "NOT":
+            self.advance()
+            return Element(InterpreterBase.NOT_NODE, op1=self.unary())
+        if token_type == "TRUE" or token_type == "FALSE":
+            return Element(InterpreterBase.BOOL_NODE, val=self.advance() == InterpreterBase.TRUE_DEF)
+        if token_type == "NIL":
+            self.advance()
+            return Element(InterpreterBase.NIL_NODE)
+        if token_type == "NEW":
+            self.advance()
+            return Element(InterpreterBase.NEW_NODE, var_type=self.expect("NAME"))
+        raise BadToken()
+
+    # name(args), starting at the LPAREN
+    def call(self, name):
+        self.advance()
+        args = []
+        if self.type != "RPAREN":
+            args.append(self.expression(1))
+            while self.type == "COMMA":
+                self.advance()
+                args.append(self.expression(1))
+        self.expect("RPAREN")
+        return Element(InterpreterBase.FCALL_NODE, name=name, args=args)
@@ -0,0 +1,137 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Resolver pass: runs over the AST once (after parse_program) and binds every variable to a slot in its func's frame.
+# At runtime each call just gets a list of frame_size values, and variables are read/written by index.
+#
+# Brewin funcs can't see their caller's variables, so the only thing that matters is which slot in the *current*
+# frame a name refers to. Blocks (if/for bodies) still get their own scope here, so shadowing works the same as
+# the old scope stack, and sibling blocks reuse each other's slots since they're never alive at the same time.
+#
+# What it writes into the nodes:
+#   func   -> 'frame_size': number of slots a call needs (params are slots 0..n-1)
+#   vardef -> 'slot': slot it defines, or None if the name was already defined in that block (runtime NAME_ERROR)
+#   =, var -> 'slot': slot it reads/writes, or None if the name isn't declared there (runtime NAME_ERROR)
+#   inline -> 'slots': slots for its params (see inliner.py), in the caller's frame
+
+from intbase import InterpreterBase
+from inliner import INLINE_NODE
+
+
+class Resolver:
+    def __init__(self):
+        self.scopes = []
+        self.next_slot = 0
+        self.frame_size = 0
+
+    def resolve_program(self, ast):
+        for func in ast.dict['functions']:
+            self.resolve_func(func)
+        return ast
+
+    def resolve_func(self, func_node):
+        self.next_slot = 0
+        self.frame_size = 0
+        # params get their own scope, the body gets another one on top (same as do_func_call + run_func)
+        params = {}
+        for arg in func_node.dict['args']:
+            params[arg.dict['name']] = self.new_slot()
+        self.scopes = [params, {}]
+        self.resolve_statements(func_node.dict['statements'])
+        func_node.dict['frame_size'] = self.frame_size
+
+    def new_slot(self):
+        slot = self.next_slot
+        self.next_slot += 1
+        if self.next_slot > self.frame_size:
+            self.frame_size = self.next_slot
+        return slot
+
+    def lookup(self, var_name):
+        for scope in reversed(self.scopes):
+            if var_name in scope:
+                return scope[var_name]
+        return None
+
+    # if/for bodies: new scope, and its slots are free again once the block is done.
+    # a block with no `var` of its own wouldn't put anything in it, so it just uses the enclosing one
+    def resolve_block(self, statements):
+        if not any(statement.elem_type == InterpreterBase.VAR_DEF_NODE for statement in statements or ()):
+            self.resolve_statements(statements)
+            return
+        saved_next_slot = self.next_slot
+        self.scopes.append({})
+        self.resolve_statements(statements)
+        self.scopes.pop()
+        self.next_slot = saved_next_slot
+
+    def resolve_statements(self, statements):
+        for statement in statements or ():
+            self.resolve_statement(statement)
+
+    def resolve_statement(self, statement_node):
+        kind = statement_node.elem_type
+        if kind == InterpreterBase.VAR_DEF_NODE:
+            var_name = statement_node.dict['name']
+            if var_name in self.scopes[-1]:
+                statement_node.dict['slot'] = None
+            else:
+                slot = self.new_slot()
+                self.scopes[-1][var_name] = slot
+                statement_node.dict['slot'] = slot
+        elif kind == "=":
+            statement_node.dict['slot'] = self.lookup(statement_node.dict['name'])
+            self.resolve_expression(statement_node.dict['expression'])
+        elif kind == InterpreterBase.RETURN_NODE:
+            if statement_node.dict['expression']:
+                self.resolve_expression(statement_node.dict['expression'])
+        elif kind == InterpreterBase.IF_NODE:
+            self.resolve_expression(statement_node.dict['condition'])
+            self.resolve_block(statement_node.dict['statements'])
+            self.resolve_block(statement_node.dict['else_statements'])
+        elif kind == InterpreterBase.FOR_NODE:
+            # init/condition/update all run in the enclosing scope, only the body gets a new one
+            self.resolve_statement(statement_node.dict['init'])
+            self.resolve_expression(statement_node.dict['condition'])
+            self.resolve_statement(statement_node.dict['update'])
+            self.resolve_block(statement_node.dict['statements'])
+        else:
+            self.resolve_expression(statement_node)
+
+    def resolve_expression(self, expression_node):
+        kind = expression_node.elem_type
+        if kind == InterpreterBase.VAR_NODE:
+            expression_node.dict['slot'] = self.lookup(expression_node.dict['name'])
+        elif kind == InterpreterBase.FCALL_NODE:
+            for arg in expression_node.dict['args']:
+                self.resolve_expression(arg)
+        elif kind == INLINE_NODE:
+            self.resolve_inline(expression_node)
+        else:
+            if 'op1' in expression_node.dict:
+                self.resolve_expression(expression_node.dict['op1'])
+            if 'op2' in expression_node.dict:
+                self.resolve_expression(expression_node.dict['op2'])
+
+    # inlined call: params get slots of their own first (so inlined calls in the args can't reuse them),
+    # args are resolved where the call was, and the body only sees the params (like the func it came from)
+    def resolve_inline(self, inline_node):
+        saved_next_slot = self.next_slot
+        params = {}
+        slots = []
+        for param in inline_node.dict['params']:
+            params[param] = self.new_slot()
+            slots.append(params[param])
+        inline_node.dict['slots'] = slots
+        for arg in inline_node.dict['args']:
+            self.resolve_expression(arg)
+        saved_scopes = self.scopes
+        self.scopes = [params]
+        self.resolve_expression(inline_node.dict['expression'])
+        self.scopes = saved_scopes
+        self.next_slot = saved_next_slot
+
+
+# exported function
+def resolve_program(ast):
+    return Resolver().resolve_program(ast)
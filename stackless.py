@@ -0,0 +1,370 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Non-recursive ("stackless") evaluator.
+# Walks the same Element tree as the tree walker, but instead of python recursion
+# (do_func_call -> run_func -> run_statement -> evaluate_expression -> ...) it keeps its own stack of work items
+# on the heap, plus a stack of values for finished expressions.
+# So Brewin recursion is only limited by memory, and by max_depth, which gives a clean Brewin error instead of
+# a python RecursionError.
+#
+# Output/errors/scoping must match the tree walker exactly (including the odd return rules).
+
+from intbase import InterpreterBase, ErrorType
+from frame import Frame
+from inliner import INLINE_NODE
+from licm import HOISTED_NODE
+
+# work item kinds. every item is a tuple: (kind, node, ...extra)
+EVAL = 0            # evaluate expression node, push its value
+EXEC = 1            # run statement node
+BLOCK = 2           # (BLOCK, statements, index): run statements[index:] in order
+APPLY = 3           # (APPLY, node): pop operand(s) and apply node's operator
+ASSIGN = 4          # (ASSIGN, node): pop value into node's slot
+STATEMENT_RESULT = 5    # pop value of a call/return statement, return from the function if not nil
+IF = 6              # (IF, node): pop condition, run a branch
+FOR_TOP = 7         # (FOR_TOP, node): evaluate condition
+FOR_CHECK = 8       # (FOR_CHECK, node): pop condition, must be bool, run body or stop the loop
+FOR_UPDATE = 9      # (FOR_UPDATE, node): run update, then back to the top
+CALL = 10           # (CALL, node, func_def): pop args, start the function
+FUNC_END = 11       # function body ran off the end, return nil
+PRINT = 12          # (PRINT, node, index, parts): print args[index:]
+PRINT_CHECK = 13    # (PRINT_CHECK, node, index, parts): pop arg value
+PRINT_STR = 14      # (PRINT_STR, node, index, parts): pop re-evaluated arg value
+INPUT = 15          # (INPUT, node): inputi/inputs after the prompt was evaluated
+TAIL_CALL = 16      # (TAIL_CALL, node, func_def): pop args, callee takes over the current frame (see tailcalls.py)
+BIND = 17           # (BIND, slot): pop value of an inlined call's arg into its slot (see inliner.py)
+
+
+class StacklessEvaluator:
+    def __init__(self, interpreter, nil, max_depth=None):
+        self.interp = interpreter
+        self.nil = nil
+        self.max_depth = max_depth
+
+    def run(self, main_func_node):
+        interp = self.interp
+        nil = self.nil
+        error = interp.error
+        max_depth = self.max_depth
+
+        todo = []       # work items, top of stack is the end of the list
+        values = []     # values of finished expressions
+        # one entry per active Brewin call: (frame, len(todo), len(values)) at the time of the call,
+        # so a return can throw away whatever its function still had left to do
+        calls = []
+
+        frame = Frame(main_func_node, None, main_func_node.dict['frame_size'])
+        interp.frame = frame
+        todo.append((FUNC_END, main_func_node))
+        todo.append((BLOCK, main_func_node.dict['statements'], 0))
+
+        while todo:
+            item = todo.pop()
+            kind = item[0]
+
+            if kind == EVAL:
+                node = item[1]
+                elem_type = node.elem_type
+                if elem_type == InterpreterBase.VAR_NODE:
+                    slot = node.dict['slot']
+                    if slot is None:
+                        error(ErrorType.NAME_ERROR, f"variable '{node.dict['name']}' used and not declared",)
+                    val = frame.locals[slot]
+                    if val is None:
+                        error(ErrorType.NAME_ERROR, f"variable '{node.dict['name']}' declared but not defined",)
+                    values.append(val)
+                elif elem_type in (InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE, InterpreterBase.BOOL_NODE):
+                    values.append(node.dict['val'])
+                elif elem_type == InterpreterBase.NIL_NODE:
+                    values.append(nil)
+                elif elem_type in BINARY_KINDS:
+                    op1 = node.dict['op1']
+                    op2 = node.dict['op2']
+                    if op1.elem_type in LEAF_KINDS and op2.elem_type in LEAF_KINDS:
+                        # nothing to wait for (ex: i < n), just do it now
+                        eval1 = self.leaf_value(op1, frame)
+                        eval2 = self.leaf_value(op2, frame)
+                        values.append(self.apply_binary(elem_type, eval1, eval2))
+                    else:
+                        # op1 has to be evaluated first, so it goes on top
+                        todo.append((APPLY, node))
+                        todo.append((EVAL, op2))
+                        todo.append((EVAL, op1))
+                elif elem_type == InterpreterBase.NEG_NODE or elem_type == InterpreterBase.NOT_NODE:
+                    todo.append((APPLY, node))
+                    todo.append((EVAL, node.dict['op1']))
+                elif elem_type == InterpreterBase.FCALL_NODE:
+                    self.start_call(node, todo, values)
+                elif elem_type == INLINE_NODE:
+                    # args go into their slots in our frame (left to right), then the func's expression runs
+                    todo.append((EVAL, node.dict['expression']))
+                    for slot, arg in reversed(list(zip(node.dict['slots'], node.dict['args']))):
+                        todo.append((BIND, slot))
+                        todo.append((EVAL, arg))
+                elif elem_type == HOISTED_NODE:
+                    # loop-invariant expression (licm.py), this engine just computes it every time
+                    todo.append((EVAL, node.dict['expression']))
+                else:
+                    # evaluate_expression returns None for anything it doesn't know
+                    values.append(None)
+
+            elif kind == APPLY:
+                node = item[1]
+                if node.elem_type == InterpreterBase.NEG_NODE or node.elem_type == InterpreterBase.NOT_NODE:
+                    values.append(self.apply_unary(node.elem_type, values.pop()))
+                else:
+                    eval2 = values.pop()
+                    eval1 = values.pop()
+                    values.append(self.apply_binary(node.elem_type, eval1, eval2))
+
+            elif kind == BLOCK:
+                statements = item[1]
+                index = item[2]
+                if statements and index < len(statements):
+                    if index + 1 < len(statements):
+                        todo.append((BLOCK, statements, index + 1))
+                    todo.append((EXEC, statements[index]))
+
+            elif kind == EXEC:
+                node = item[1]
+                elem_type = node.elem_type
+                if elem_type == "=":
+                    slot = node.dict['slot']
+                    if slot is None:
+                        error(ErrorType.NAME_ERROR, f"variable used and not declared: {node.dict['name']}",)
+                    todo.append((ASSIGN, node))
+                    todo.append((EVAL, node.dict['expression']))
+                elif elem_type == InterpreterBase.VAR_DEF_NODE:
+                    slot = node.dict['slot']
+                    if slot is None:
+                        error(ErrorType.NAME_ERROR, f"Variable {node.dict['name']} defined more than once",)
+                    frame.locals[slot] = None
+                elif elem_type == InterpreterBase.IF_NODE:
+                    todo.append((IF, node))
+                    todo.append((EVAL, node.dict['condition']))
+                elif elem_type == InterpreterBase.FOR_NODE:
+                    todo.append((FOR_TOP, node))
+                    todo.append((EXEC, node.dict['init']))
+                elif elem_type == InterpreterBase.FCALL_NODE:
+                    # a call whose value isn't nil ends the function (tree walker behavior)
+                    todo.append((STATEMENT_RESULT, node))
+                    todo.append((EVAL, node))
+                elif elem_type == InterpreterBase.RETURN_NODE:
+                    if not node.dict['expression']:
+                        frame = self.do_return(nil, todo, values, calls)
+                    else:
+                        todo.append((STATEMENT_RESULT, node))
+                        todo.append((EVAL, node.dict['expression']))
+                # anything else is ignored by the tree walker
+
+            elif kind == ASSIGN:
+                frame.locals[item[1].dict['slot']] = values.pop()
+            elif kind == BIND:
+                frame.locals[item[1]] = values.pop()
+
+            elif kind == STATEMENT_RESULT:
+                return_value = values.pop()
+                if return_value is not nil:
+                    frame = self.do_return(return_value, todo, values, calls)
+
+            elif kind == IF:
+                node = item[1]
+                condition = values.pop()
+                if type(condition) is not bool:
+                    error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+                if condition:
+                    todo.append((BLOCK, node.dict['statements'], 0))
+                else:
+                    todo.append((BLOCK, node.dict['else_statements'], 0))
+
+            elif kind == FOR_TOP:
+                node = item[1]
+                todo.append((FOR_CHECK, node))
+                todo.append((EVAL, node.dict['condition']))
+            elif kind == FOR_CHECK:
+                node = item[1]
+                # condition is evaluated exactly once per iteration, and has to be a bool
+                condition = values.pop()
+                if type(condition) is not bool:
+                    error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+                if condition:
+                    todo.append((FOR_UPDATE, node))
+                    todo.append((BLOCK, node.dict['statements'], 0))
+            elif kind == FOR_UPDATE:
+                node = item[1]
+                todo.append((FOR_TOP, node))
+                todo.append((EXEC, node.dict['update']))
+
+            elif kind == CALL:
+                func_def = item[2]
+                if max_depth is not None and len(calls) >= max_depth:
+                    error(ErrorType.FAULT_ERROR, f"Maximum recursion depth of {max_depth} exceeded",)
+                # callee gets a fresh frame with only its arguments in it
+                callee = Frame(func_def, frame, func_def.dict['frame_size'])
+                arg_count = len(func_def.dict['args'])
+                if arg_count:
+                    callee.locals[:arg_count] = values[-arg_count:]
+                    del values[-arg_count:]
+                calls.append((frame, len(todo), len(values)))
+                frame = callee
+                interp.frame = frame
+                todo.append((FUNC_END, func_def))
+                todo.append((BLOCK, func_def.dict['statements'], 0))
+
+            elif kind == TAIL_CALL:
+                func_def = item[2]
+                arg_count = len(func_def.dict['args'])
+                arg_values = values[-arg_count:] if arg_count else []
+                # throw away whatever the current function still had left to do, same as a return
+                todo_height, values_height = (calls[-1][1], calls[-1][2]) if calls else (0, 0)
+                del todo[todo_height:]
+                del values[values_height:]
+                frame.func = func_def
+                # params get overwritten, every other slot is always defined (set to None) before it's read
+                if len(frame.locals) != func_def.dict['frame_size']:
+                    frame.locals = [None] * func_def.dict['frame_size']
+                frame.locals[:arg_count] = arg_values
+                todo.append((FUNC_END, func_def))
+                todo.append((BLOCK, func_def.dict['statements'], 0))
+
+            elif kind == FUNC_END:
+                frame = self.do_return(nil, todo, values, calls)
+
+            elif kind == PRINT:
+                node, index, parts = item[1], item[2], item[3]
+                args = node.dict['args']
+                if index == len(args):
+                    interp.output("".join(parts))
+                    values.append(nil)
+                else:
+                    todo.append((PRINT_CHECK, node, index, parts))
+                    todo.append((EVAL, args[index]))
+            elif kind == PRINT_CHECK:
+                node, index, parts = item[1], item[2], item[3]
+                eval = values.pop()
+                if type(eval) is bool:
+                    parts.append("true" if eval else "false")
+                    todo.append((PRINT, node, index + 1, parts))
+                else:
+                    # tree walker evaluates non-bool args a second time, keep that.
+                    todo.append((PRINT_STR, node, index, parts))
+                    todo.append((EVAL, node.dict['args'][index]))
+            elif kind == PRINT_STR:
+                node, index, parts = item[1], item[2], item[3]
+                parts.append(str(values.pop()))
+                todo.append((PRINT, node, index + 1, parts))
+
+            elif kind == INPUT:
+                if item[1].dict['args']:
+                    interp.output(values.pop())
+                user_in = interp.get_input()
+                try:
+                    user_in = int(user_in)
+                except:
+                    pass
+                values.append(user_in)
+
+    # value of a variable or literal (LEAF_KINDS), same errors as EVAL
+    def leaf_value(self, node, frame):
+        elem_type = node.elem_type
+        if elem_type == InterpreterBase.VAR_NODE:
+            slot = node.dict['slot']
+            if slot is None:
+                self.interp.error(ErrorType.NAME_ERROR, f"variable '{node.dict['name']}' used and not declared",)
+            val = frame.locals[slot]
+            if val is None:
+                self.interp.error(ErrorType.NAME_ERROR, f"variable '{node.dict['name']}' declared but not defined",)
+            return val
+        if elem_type == InterpreterBase.NIL_NODE:
+            return self.nil
+        return node.dict['val']
+
+    # leave the current function with return_value, returns the caller's frame (None once main is done)
+    def do_return(self, return_value, todo, values, calls):
+        if not calls:
+            # main is done, nothing else to run
+            todo.clear()
+            self.interp.frame = None
+            return None
+        frame, todo_height, values_height = calls.pop()
+        del todo[todo_height:]
+        del values[values_height:]
+        values.append(return_value)
+        self.interp.frame = frame
+        return frame
+
+    # pushes the work for a call expression (builtins + user functions)
+    def start_call(self, node, todo, values):
+        interp = self.interp
+        func_call = node.dict['name']
+        args = node.dict['args']
+        if func_call == "print":
+            todo.append((PRINT, node, 0, []))
+            return
+        if func_call == "inputi" or func_call == "inputs":
+            if len(args) > 1:
+                interp.error(ErrorType.NAME_ERROR, f"No {func_call}() function found that takes > 1 parameter",)
+            todo.append((INPUT, node))
+            if args:
+                todo.append((EVAL, args[0]))
+            return
+        if not interp.check_valid_func(func_call):
+            interp.error(ErrorType.NAME_ERROR, f"Function {func_call} was not found",)
+        func_def = interp.get_func_def(func_call, len(args))
+        todo.append((TAIL_CALL if node.dict.get('tail_call') else CALL, node, func_def))
+        # args get evaluated left to right, so the first one goes on top
+        for arg in reversed(args):
+            todo.append((EVAL, arg))
+
+    def apply_unary(self, kind, eval):
+        interp = self.interp
+        if kind == InterpreterBase.NEG_NODE:
+            if not (type(eval) == int):
+                interp.error(ErrorType.TYPE_ERROR, "'negation' can only be used on integer values.",)
+            return -(eval)
+        if not (type(eval) == bool):
+            interp.error(ErrorType.TYPE_ERROR, "'Not' can only be used on boolean values.",)
+        return not (eval)
+
+    def apply_binary(self, kind, eval1, eval2):
+        interp = self.interp
+        if kind == "+":
+            if not ((type(eval1) == int and type(eval2) == int) or (type(eval1) == str and type(eval2) == str)):
+                interp.error(ErrorType.TYPE_ERROR, "Types for + must be both of type int or string.",)
+            return eval1 + eval2
+        if kind in ("-", "*", "/"):
+            if not (type(eval1) == int and type(eval2) == int):
+                interp.error(ErrorType.TYPE_ERROR, "Arguments must be of type 'int'.",)
+            if kind == "-":
+                return eval1 - eval2
+            if kind == "*":
+                return eval1 * eval2
+            # integer division
+            return eval1 // eval2
+        if kind == '==':
+            return type(eval1) == type(eval2) and eval1 == eval2
+        if kind == '!=':
+            return type(eval1) != type(eval2) or eval1 != eval2
+        if kind in ('&&', '||'):
+            # both sides were already evaluated (strict evaluation)
+            if (type(eval1) is not bool) or (type(eval2) is not bool):
+                interp.error(ErrorType.TYPE_ERROR, f"Comparison args for {kind} must be of same type bool.",)
+            if kind == '&&':
+                return eval1 and eval2
+            return eval1 or eval2
+        if not (type(eval1) == int and type(eval2) == int):
+            interp.error(ErrorType.TYPE_ERROR, f"Comparison args for {kind} must be of same type int.",)
+        if kind == '<':
+            return eval1 < eval2
+        if kind == '<=':
+            return eval1 <= eval2
+        if kind == '>':
+            return eval1 > eval2
+        return eval1 >= eval2
+
+
+BINARY_KINDS = frozenset(["+", "-", "*", "/", '==', '<', '<=', '>', '>=', '!=', '&&', '||'])
+# nodes that can be evaluated on the spot, without pushing work
+LEAF_KINDS = frozenset([InterpreterBase.VAR_NODE, InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE,
+                        InterpreterBase.BOOL_NODE, InterpreterBase.NIL_NODE])
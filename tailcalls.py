@@ -0,0 +1,44 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Marks user function calls that are in tail position, so the engines can reuse the caller's frame
+# instead of stacking a new call on top of it.
+#
+# A call is in tail position if it's the last thing its function does:
+#   - `return f(...);` or a bare `f(...);` statement (a non-nil value from either one ends the function anyway)
+#   - as the LAST statement of the func body, or of an if/else branch whose if is itself in tail position.
+# If f returns nil, execution would just fall off the end of the caller and return nil too, so the caller
+# returns exactly what f returns either way. Calls inside for loops are never tail calls (the loop keeps going).
+#
+# Marked fcall nodes get 'tail_call': True. Only calls that resolve to a user function are marked,
+# anything that would error (unknown function, wrong arg count) stays a normal call.
+
+from intbase import InterpreterBase
+
+BUILTINS = ("print", "inputi", "inputs")
+
+
+def mark_tail_calls(ast, func_table):
+    count = 0
+    for func in ast.dict['functions']:
+        count += mark_block(func.dict['statements'], func_table)
+    return count
+
+
+def mark_block(statements, func_table):
+    if not statements:
+        return 0
+    last = statements[-1]
+    if last.elem_type == InterpreterBase.IF_NODE:
+        return mark_block(last.dict['statements'], func_table) + mark_block(last.dict['else_statements'], func_table)
+    if last.elem_type == InterpreterBase.RETURN_NODE:
+        call = last.dict['expression']
+    else:
+        call = last
+    if call is None or call.elem_type != InterpreterBase.FCALL_NODE:
+        return 0
+    func_call = call.dict['name']
+    if func_call in BUILTINS or (func_call, len(call.dict['args'])) not in func_table:
+        return 0
+    call.dict['tail_call'] = True
+    return 1
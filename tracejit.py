@@ -0,0 +1,700 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Tracing JIT for hot for loops (Interpreter(tracing=True), "tree" engine only).
+#
+# The tree walker counts iterations of every for loop. Once a loop has run hot_loop iterations, the next iteration
+# is run by TraceRecorder, which does exactly what the tree walker would but writes down the type of every variable
+# it reads and which way every if went. TraceCompiler then turns that one iteration (condition, body, update) into
+# a python function that runs the rest of the loop's iterations, with the operators specialized for those types.
+#
+# The trace only trusts types it has guarded:
+#   - variables the loop never assigns get their type checked once, when the trace starts
+#   - other variables get checked at the start of the statement that reads them, unless the trace already knows
+#     the type from something it assigned earlier (an int + an int is an int...)
+# If a guard fails the trace bails: it writes its variables back to the frame and says where it stopped, and the
+# tree walker finishes the iteration from that statement (nothing of it has run yet) and keeps going normally.
+# A trace that bails too often (MAX_BAILS) gets thrown away and the loop can be traced again later with whatever
+# types it has now. After MAX_TRACES tries the loop just stays in the tree walker.
+#
+# Statements that make calls (a user function's body runs in the tree walker anyway) and nested for loops (they get
+# their own trace when they get hot) don't get traced, the tree walker runs them from inside the trace (_run).
+# Variables those can change are read back from the frame afterwards, and their types aren't known anymore.
+#
+# The side of an if the recorded iteration didn't take runs through TraceRecorder from inside the trace (_side),
+# so its types get written down too. Once it has run hot_loop times the trace stops right after the if and gets
+# compiled again with both sides traced.
+#
+# Every variable the trace uses is a python local (v<slot>) while it runs, and gets written back to the frame
+# whenever the tree walker needs it (before _run, and when the trace ends). Counting loops (loops.py) run over a
+# python range like in do_for_loop.
+
+from intbase import InterpreterBase, ErrorType
+from inliner import INLINE_NODE
+from licm import HOISTED_NODE, find_assigned, find_assigned_in_statement, find_assigned_in_expression
+from quicken import QUICKENED
+from transpiler import HELPERS, TYPED_OPERATORS, makes_calls, make_runtime
+from element import Element
+
+MAX_BAILS = 16
+MAX_TRACES = 3
+
+# what a trace function returns besides an exit number (which says where the tree walker picks up)
+LOOP_DONE = -1
+RETURNED = -2
+
+ARITHMETIC = ('+', '-', '*', '/')
+COMPARISONS = ('<', '<=', '>', '>=')
+EQUALITY = ('==', '!=')
+BOOLEAN = ('&&', '||')
+LITERALS = (InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE, InterpreterBase.BOOL_NODE)
+# names the generated code uses in its type guards (nil is the only Element a variable can hold)
+TYPE_NAMES = {int: "int", str: "str", bool: "bool", Element: "_Nil"}
+
+
+class Trace:
+    __slots__ = ('function', 'exits', 'source', 'recorder', 'bails', 'stale')
+
+    def __init__(self, exits, source, recorder):
+        self.function = None
+        # exit number -> ([(statements, index to start at), ...] innermost block first, run the update after?)
+        self.exits = exits
+        self.source = source
+        # what the trace was compiled from (side branches keep adding to it)
+        self.recorder = recorder
+        self.bails = 0
+        # a side branch got hot, compile again
+        self.stale = False
+
+
+class TraceJIT:
+    def __init__(self, interpreter, nil, hot_loop):
+        self.interp = interpreter
+        self.nil = nil
+        self.hot_loop = hot_loop
+        # how many traces got compiled, and how many times one bailed
+        self.compiled = 0
+        self.bailed = 0
+
+    # same as Interpreter.do_for_loop, but hot loops get traced
+    def run_loop(self, for_node):
+        interp = self.interp
+        nil = self.nil
+        temps = for_node.dict.get('temps')
+        if temps is not None:
+            for slot in temps:
+                interp.frame.locals[slot] = None
+        interp.run_statement(for_node.dict['init'])
+        update = for_node.dict['update']
+        condition = for_node.dict['condition']
+        statements = for_node.dict['statements']
+
+        while True:
+            trace = for_node.dict.get('trace')
+            if trace is not None:
+                exit = trace.function(interp.frame.locals)
+                if exit == LOOP_DONE:
+                    return nil
+                if exit == RETURNED:
+                    return interp.return_signal
+                return_value = self.bail(for_node, trace, exit)
+                if return_value is not nil:
+                    return return_value
+                # at least one iteration in the tree walker before trying the trace again
+            elif self.is_hot(for_node):
+                recorder = TraceRecorder(interp, nil)
+                return_value = recorder.record_iteration(for_node)
+                if return_value is not nil:
+                    return nil if return_value == LOOP_DONE else return_value
+                self.compile(for_node, recorder)
+                continue
+
+            result = interp.evaluate_expression(condition)
+            if type(result) is not bool:
+                interp.error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+            if not result:
+                return nil
+            for statement in statements:
+                return_value = interp.run_statement(statement)
+                if return_value is not nil:
+                    return return_value
+            interp.run_statement(update)
+
+    def is_hot(self, for_node):
+        if 'no_trace' in for_node.dict:
+            return False
+        iterations = for_node.dict.get('iterations', 0) + 1
+        for_node.dict['iterations'] = iterations
+        return iterations > self.hot_loop
+
+    def compile(self, for_node, recorder):
+        traces = for_node.dict.get('traces', 0) + 1
+        for_node.dict['traces'] = traces
+        trace = None
+        if traces <= MAX_TRACES:
+            trace = TraceCompiler(self, for_node, recorder).compile_trace()
+        if trace is None:
+            for_node.dict['no_trace'] = True
+            return
+        for_node.dict['trace'] = trace
+        self.compiled += 1
+
+    # a guard failed (or a side branch got hot): run the rest of the iteration from where the trace stopped
+    def bail(self, for_node, trace, exit):
+        interp = self.interp
+        nil = self.nil
+        if for_node.dict.get('trace') is trace:
+            if trace.stale:
+                # same recording plus what the side branches saw, doesn't count as another try
+                for_node.dict['trace'] = TraceCompiler(self, for_node, trace.recorder).compile_trace()
+                self.compiled += 1
+            else:
+                self.bailed += 1
+                trace.bails += 1
+                if trace.bails >= MAX_BAILS:
+                    del for_node.dict['trace']
+                    for_node.dict['iterations'] = 0
+        blocks, run_update = trace.exits[exit]
+        for statements, start in blocks:
+            for index in range(start, len(statements)):
+                return_value = interp.run_statement(statements[index])
+                if return_value is not nil:
+                    return return_value
+        if run_update:
+            interp.run_statement(for_node.dict['update'])
+        return nil
+
+
+# statements the trace leaves to the tree walker
+def is_opaque(statement_node):
+    kind = statement_node.elem_type
+    if kind == InterpreterBase.VAR_DEF_NODE:
+        # no slot = defined twice, the tree walker gives the error
+        return statement_node.dict['slot'] is None
+    if kind == "=":
+        return statement_node.dict['slot'] is None or makes_calls(statement_node.dict['expression'])
+    if kind == InterpreterBase.FCALL_NODE:
+        return statement_node.dict['name'] != "print" or any(makes_calls(arg) for arg in statement_node.dict['args'])
+    if kind == InterpreterBase.RETURN_NODE:
+        return statement_node.dict['expression'] is not None and makes_calls(statement_node.dict['expression'])
+    if kind == InterpreterBase.IF_NODE:
+        return makes_calls(statement_node.dict['condition'])
+    return True
+
+
+# slots the tree walker can change running statements (hoisted temporaries too)
+def find_written(statements):
+    slots = set()
+    find_assigned(statements, slots)
+    for statement in statements:
+        find_hoisted(statement, slots)
+    # (a `var` defined twice has no slot)
+    slots.discard(None)
+    return slots
+
+
+def find_hoisted(node, slots):
+    if node.elem_type == HOISTED_NODE:
+        slots.add(node.dict['slot'])
+    for value in node.dict.values():
+        if isinstance(value, Element):
+            find_hoisted(value, slots)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, Element):
+                    find_hoisted(item, slots)
+
+
+def generic_kind(kind):
+    if kind in QUICKENED:
+        return QUICKENED[kind][2]
+    return kind
+
+
+# runs one iteration of a loop exactly like the tree walker, writing down what it sees
+class TraceRecorder:
+    def __init__(self, interpreter, nil):
+        self.interp = interpreter
+        self.nil = nil
+        # id of var node -> type of the value it read
+        self.types = {}
+        # id of if node -> which ways it went ({True}, {False} or both)
+        self.directions = {}
+
+    # condition, body and update. returns LOOP_DONE if the condition was false, the return signal if the
+    # body returned, otherwise nil
+    def record_iteration(self, for_node):
+        result = self.evaluate(for_node.dict['condition'])
+        if type(result) is not bool:
+            self.interp.error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+        if not result:
+            return LOOP_DONE
+        return_value = self.record_statements(for_node.dict['statements'])
+        if return_value is not self.nil:
+            return return_value
+        self.record_statement(for_node.dict['update'])
+        return self.nil
+
+    def record_statements(self, statements):
+        for statement in statements or ():
+            return_value = self.record_statement(statement)
+            if return_value is not self.nil:
+                return return_value
+        return self.nil
+
+    def record_statement(self, statement_node):
+        interp = self.interp
+        if is_opaque(statement_node):
+            return interp.run_statement(statement_node)
+        kind = statement_node.elem_type
+        if kind == InterpreterBase.VAR_DEF_NODE:
+            interp.do_definition(statement_node)
+        elif kind == "=":
+            interp.frame.locals[statement_node.dict['slot']] = self.evaluate(statement_node.dict['expression'])
+        elif kind == InterpreterBase.FCALL_NODE:
+            # print (anything else is opaque). non-bool args get evaluated twice like in do_func_call
+            output = ""
+            for arg in statement_node.dict['args']:
+                value = self.evaluate(arg)
+                if type(value) is bool:
+                    output += "true" if value else "false"
+                else:
+                    output += str(self.evaluate(arg))
+            interp.output(output)
+        elif kind == InterpreterBase.RETURN_NODE:
+            if statement_node.dict['expression'] is None:
+                interp.return_signal.value = self.nil
+                return interp.return_signal
+            return_value = self.evaluate(statement_node.dict['expression'])
+            if return_value is self.nil:
+                return self.nil
+            interp.return_signal.value = return_value
+            return interp.return_signal
+        elif kind == InterpreterBase.IF_NODE:
+            condition = self.evaluate(statement_node.dict['condition'])
+            if type(condition) is not bool:
+                interp.error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+            self.directions.setdefault(id(statement_node), set()).add(condition)
+            if condition:
+                return self.record_statements(statement_node.dict['statements'])
+            return self.record_statements(statement_node.dict['else_statements'])
+        return self.nil
+
+    def evaluate(self, expression_node):
+        interp = self.interp
+        kind = generic_kind(expression_node.elem_type)
+        if kind == InterpreterBase.VAR_NODE:
+            value = interp.get_value_of_variable(expression_node)
+            self.types[id(expression_node)] = type(value)
+            return value
+        if kind == HOISTED_NODE:
+            local_vars = interp.frame.locals
+            slot = expression_node.dict['slot']
+            if local_vars[slot] is None:
+                local_vars[slot] = self.evaluate(expression_node.dict['expression'])
+            return local_vars[slot]
+        if kind == INLINE_NODE:
+            for slot, arg in zip(expression_node.dict['slots'], expression_node.dict['args']):
+                interp.frame.locals[slot] = self.evaluate(arg)
+            return self.evaluate(expression_node.dict['expression'])
+        if kind not in HELPERS:
+            # literals (and anything else the tree walker doesn't look inside)
+            return interp.evaluate_expression(expression_node)
+        eval1 = self.evaluate(expression_node.dict['op1'])
+        if 'op2' not in expression_node.dict:
+            return interp.apply_unary_operator(kind, eval1)
+        eval2 = self.evaluate(expression_node.dict['op2'])
+        if kind in ARITHMETIC:
+            return interp.apply_binary_operator(kind, eval1, eval2)
+        if kind in BOOLEAN:
+            return interp.apply_binary_boolean_operator(kind, eval1, eval2)
+        return interp.apply_comparison_operator(kind, eval1, eval2)
+
+
+# turns a recorded iteration into python source for the trace function
+class TraceCompiler:
+    def __init__(self, jit, for_node, recorder):
+        self.jit = jit
+        self.for_node = for_node
+        self.recorder = recorder
+        self.types = recorder.types
+        self.directions = recorder.directions
+        # slots the loop can change, anything else keeps the type it had when the trace started
+        self.assigned = set()
+        find_assigned(for_node.dict['statements'], self.assigned)
+        find_assigned_in_statement(for_node.dict['update'], self.assigned)
+        find_assigned_in_expression(for_node.dict['condition'], self.assigned)
+        self.lines = []
+        self.depth = 0
+        # exit 0: a guard failed before the iteration started
+        self.exits = [([], False)]
+        # (statements, index) of the statement being compiled and the ones around it, outermost first
+        self.frames = []
+        self.run_update = False
+        # slot -> type the value is known to have right now (None = defined, but no idea what it is)
+        self.env = {}
+        # guards for the statement being compiled, and the ones checked when the trace starts
+        self.guards = []
+        self.entry_guards = {}
+        self.used = set()
+        self.written = set()
+        # statement lists _run(k) runs in the tree walker, and _side(k) runs through the recorder
+        self.run_blocks = []
+        self.side_blocks = []
+
+    def emit(self, line):
+        self.lines.append("    " * self.depth + line)
+
+    # returns a Trace, or None if the loop can't be traced
+    def compile_trace(self):
+        for_node = self.for_node
+        condition = for_node.dict['condition']
+        counter = for_node.dict.get('counter')
+        self.depth = 1
+        if counter is not None:
+            # same as do_for_loop: i runs over a range, the condition and update never actually run
+            slot, comparison, step = counter
+            bound = condition.dict['op2']
+            self.env[slot] = int
+            self.entry_guards[slot] = int
+            self.used.add(slot)
+            self.written.add(slot)
+            if bound.elem_type == InterpreterBase.VAR_NODE:
+                bound_slot = bound.dict['slot']
+                self.env[bound_slot] = int
+                self.entry_guards[bound_slot] = int
+                self.used.add(bound_slot)
+                end = f"v{bound_slot}"
+            else:
+                end = repr(bound.dict['val'])
+            if comparison == '<=':
+                end = f"{end} + 1"
+            elif comparison == '>=':
+                end = f"{end} - 1"
+            self.emit(f"_values = range(v{slot}, {end}, {step})")
+            self.emit(f"for v{slot} in _values:")
+        else:
+            if makes_calls(condition):
+                return None
+            self.emit("while True:")
+            self.depth = 2
+            # a guard failing here just goes back to the tree walker's condition check
+            code, value_type = self.compile_expression(condition)
+            self.emit_guards()
+            if value_type is not bool:
+                code = f"_condition({code})"
+            self.emit(f"if not {code}:")
+            self.depth += 1
+            self.emit_exit(LOOP_DONE)
+            self.depth -= 1
+        self.depth = 2
+        self.run_update = True
+        self.compile_block(for_node.dict['statements'])
+        if counter is None:
+            self.run_update = False
+            self.compile_block([for_node.dict['update']])
+        else:
+            # i ends up one step past the last value, same as after the last update
+            self.depth = 1
+            self.emit("else:")
+            self.emit("    if _values:")
+            self.emit(f"        v{slot} = _values[-1] + {step}")
+            self.emit(f"    _exit = {LOOP_DONE}")
+        return self.build()
+
+    def build(self):
+        writeback = "; ".join(f"L[{slot}] = v{slot}" for slot in sorted(self.written)) or "pass"
+        lines = ["def trace(L):"]
+        for slot in sorted(self.used | self.written):
+            lines.append(f"    v{slot} = L[{slot}]")
+        if self.entry_guards:
+            checks = " or ".join(f"type(v{slot}) is not {TYPE_NAMES[value_type]}"
+                                 for slot, value_type in sorted(self.entry_guards.items()))
+            lines.append(f"    if {checks}:")
+            lines.append("        return 0")
+        for line in self.lines:
+            lines.append(line.replace("#FLUSH", writeback))
+        lines.append("    " + writeback)
+        lines.append("    return _exit")
+        source = "\n".join(lines) + "\n"
+
+        interp = self.jit.interp
+        nil = self.jit.nil
+        hot_loop = self.jit.hot_loop
+        run_blocks = self.run_blocks
+        side_blocks = self.side_blocks
+        side_counts = [0] * len(side_blocks)
+        recorder = self.recorder
+        trace = Trace(self.exits, source, recorder)
+
+        def _run(index):
+            for statement in run_blocks[index]:
+                return_value = interp.run_statement(statement)
+                if return_value is not nil:
+                    return return_value
+            return nil
+
+        # the trace stops after the if when this returns trace (and the jit compiles it again)
+        def _side(index):
+            statements, if_id, direction = side_blocks[index]
+            recorder.directions[if_id].add(direction)
+            return_value = recorder.record_statements(statements)
+            side_counts[index] += 1
+            if return_value is nil and side_counts[index] >= hot_loop:
+                trace.stale = True
+                return trace
+            return return_value
+
+        runtime = make_runtime(interp, nil)
+        runtime['_run'] = _run
+        runtime['_side'] = _side
+        runtime['_signal'] = interp.return_signal
+        runtime['_Nil'] = Element
+        exec(compile(source, "<trace>", "exec"), runtime)
+        trace.function = runtime['trace']
+        return trace
+
+    ### STATEMENTS ###
+
+    def compile_block(self, statements):
+        start = len(self.lines)
+        for index, statement in enumerate(statements or ()):
+            self.frames.append((statements, index))
+            self.compile_statement(statement)
+            self.frames.pop()
+        if len(self.lines) == start:
+            self.emit("pass")
+
+    # where the tree walker picks up if a guard fails before the current statement (or right after it)
+    def make_exit(self, after=False):
+        blocks = []
+        for depth, (statements, index) in enumerate(reversed(self.frames)):
+            # blocks around this one go on after the statement that holds it
+            blocks.append((statements, index if depth == 0 and not after else index + 1))
+        self.exits.append((blocks, self.run_update))
+        return len(self.exits) - 1
+
+    def emit_exit(self, exit):
+        self.emit(f"_exit = {exit}")
+        self.emit("break")
+
+    def emit_guards(self):
+        if not self.guards:
+            return
+        checks = " or ".join(f"type(v{slot}) is not {TYPE_NAMES[value_type]}" for slot, value_type in self.guards)
+        self.guards = []
+        self.emit(f"if {checks}:")
+        self.depth += 1
+        self.emit_exit(self.make_exit())
+        self.depth -= 1
+
+    def compile_statement(self, statement_node):
+        self.guards = []
+        kind = statement_node.elem_type
+        if is_opaque(statement_node):
+            may_return = kind in (InterpreterBase.FCALL_NODE, InterpreterBase.RETURN_NODE,
+                                  InterpreterBase.IF_NODE, InterpreterBase.FOR_NODE)
+            self.compile_opaque([statement_node], may_return)
+        elif kind == InterpreterBase.VAR_DEF_NODE:
+            slot = statement_node.dict['slot']
+            self.emit(f"v{slot} = None")
+            self.env.pop(slot, None)
+            self.written.add(slot)
+        elif kind == "=":
+            slot = statement_node.dict['slot']
+            code, value_type = self.compile_expression(statement_node.dict['expression'])
+            self.emit_guards()
+            self.emit(f"v{slot} = {code}")
+            self.env[slot] = value_type
+            self.written.add(slot)
+        elif kind == InterpreterBase.FCALL_NODE:
+            parts = [self.compile_print_arg(arg) for arg in statement_node.dict['args']]
+            self.emit_guards()
+            self.emit(f"_print({', '.join(parts)})")
+        elif kind == InterpreterBase.RETURN_NODE:
+            self.compile_return(statement_node)
+        elif kind == InterpreterBase.IF_NODE:
+            self.compile_if(statement_node)
+
+    # the tree walker runs statements, the trace reads back whatever they could have changed
+    # side is (if node, which way it went) for the side of an if that didn't get traced
+    def compile_opaque(self, statements, may_return, side=None):
+        if side is not None:
+            index = len(self.side_blocks)
+            self.side_blocks.append((statements, id(side[0]), side[1]))
+            call = f"_side({index})"
+        else:
+            index = len(self.run_blocks)
+            self.run_blocks.append(statements)
+            call = f"_run({index})"
+        self.emit("#FLUSH")
+        self.emit(f"_r = {call}" if may_return else call)
+        for slot in sorted(find_written(statements)):
+            self.emit(f"v{slot} = L[{slot}]")
+            self.used.add(slot)
+            self.env.pop(slot, None)
+        if may_return:
+            self.emit("if _r is not nil:")
+            self.depth += 1
+            if side is not None:
+                self.emit("if _r is not _signal:")
+                self.depth += 1
+                self.emit_exit(self.make_exit(True))
+                self.depth -= 1
+            self.emit_exit(RETURNED)
+            self.depth -= 1
+
+    def compile_return(self, statement_node):
+        expression = statement_node.dict['expression']
+        if expression is None:
+            self.emit("_signal.value = nil")
+            self.emit_exit(RETURNED)
+            return
+        code, value_type = self.compile_expression(expression)
+        self.emit_guards()
+        if value_type in (int, str, bool):
+            self.emit(f"_signal.value = {code}")
+            self.emit_exit(RETURNED)
+            return
+        # returning nil keeps going
+        self.emit(f"_r = {code}")
+        self.emit("if _r is not nil:")
+        self.depth += 1
+        self.emit("_signal.value = _r")
+        self.emit_exit(RETURNED)
+        self.depth -= 1
+
+    # the side(s) the recorded iterations took get traced, the other side runs through the recorder
+    def compile_if(self, statement_node):
+        taken = self.directions.get(id(statement_node))
+        if taken is None:
+            self.compile_opaque([statement_node], True)
+            return
+        code, value_type = self.compile_expression(statement_node.dict['condition'])
+        self.emit_guards()
+        if value_type is not bool:
+            code = f"_condition({code})"
+        statements = statement_node.dict['statements']
+        else_statements = statement_node.dict['else_statements']
+        before = self.env
+        self.emit(f"if {code}:")
+        self.depth += 1
+        self.env = dict(before)
+        if True in taken:
+            self.compile_block(statements)
+        elif statements:
+            self.compile_opaque(statements, True, (statement_node, True))
+        else:
+            self.emit("pass")
+        then_env = self.env
+        self.depth -= 1
+        else_env = before
+        if else_statements:
+            self.emit("else:")
+            self.depth += 1
+            self.env = dict(before)
+            if False in taken:
+                self.compile_block(else_statements)
+            else:
+                self.compile_opaque(else_statements, True, (statement_node, False))
+            else_env = self.env
+            self.depth -= 1
+        # only what's true coming out of both sides
+        self.env = {slot: value_type for slot, value_type in then_env.items()
+                    if slot in else_env and else_env[slot] is value_type}
+
+    def compile_print_arg(self, arg):
+        code, value_type = self.compile_expression(arg)
+        if value_type is str:
+            return code
+        if value_type is int:
+            return f"str({code})"
+        if value_type is bool:
+            return f"('true' if {code} else 'false')"
+        return f"_to_str({code})"
+
+    ### EXPRESSIONS ###
+
+    # returns (python expression, type of its value or None if not known)
+    def compile_expression(self, expression_node):
+        kind = generic_kind(expression_node.elem_type)
+        if kind in LITERALS:
+            value = expression_node.dict['val']
+            return repr(value), type(value)
+        if kind == InterpreterBase.NIL_NODE:
+            return "nil", Element
+        if kind == InterpreterBase.VAR_NODE:
+            return self.compile_variable(expression_node)
+        if kind == INLINE_NODE:
+            parts = []
+            for slot, arg in zip(expression_node.dict['slots'], expression_node.dict['args']):
+                code, value_type = self.compile_expression(arg)
+                parts.append(f"(v{slot} := {code})")
+                self.env[slot] = value_type
+                self.written.add(slot)
+            code, value_type = self.compile_expression(expression_node.dict['expression'])
+            if not parts:
+                return code, value_type
+            return f"({', '.join(parts)}, {code})[-1]", value_type
+        if kind == HOISTED_NODE:
+            slot = expression_node.dict['slot']
+            self.written.add(slot)
+            # the expression only runs the first time, nothing it reads is known afterwards
+            saved_env = dict(self.env)
+            code, value_type = self.compile_expression(expression_node.dict['expression'])
+            self.env = saved_env
+            return f"(v{slot} if v{slot} is not None else (v{slot} := {code}))", value_type
+        if kind not in HELPERS:
+            return "None", None
+        typed = 'typed' in expression_node.dict
+
+        op1, type1 = self.compile_expression(expression_node.dict['op1'])
+        if 'op2' not in expression_node.dict:
+            if kind == InterpreterBase.NEG_NODE:
+                if typed or type1 is int:
+                    return f"(-{op1})", int
+                return f"_neg({op1})", int
+            if typed or type1 is bool:
+                return f"(not {op1})", bool
+            return f"_not({op1})", bool
+        op2, type2 = self.compile_expression(expression_node.dict['op2'])
+        if kind == '+':
+            raw = typed or (type1 is type2 and type1 in (int, str))
+            # if it doesn't error, both sides have the same type
+            value_type = type1 if type1 in (int, str) else (type2 if type2 in (int, str) else None)
+        elif kind in ARITHMETIC:
+            raw = typed or (type1 is int and type2 is int)
+            value_type = int
+        elif kind in COMPARISONS:
+            raw = typed or (type1 is int and type2 is int)
+            value_type = bool
+        elif kind in EQUALITY:
+            raw = typed or (type1 is not None and type1 is type2)
+            value_type = bool
+        else:
+            raw = typed or (type1 is bool and type2 is bool)
+            value_type = bool
+        if raw:
+            return f"({op1} {TYPED_OPERATORS[kind]} {op2})", value_type
+        return f"{HELPERS[kind]}({op1}, {op2})", value_type
+
+    def compile_variable(self, expression_node):
+        slot = expression_node.dict['slot']
+        var_name = expression_node.dict['name']
+        if slot is None:
+            message = f"variable '{var_name}' used and not declared"
+            return f"_error(NAME_ERROR, {message!r})", None
+        self.used.add(slot)
+        if slot in self.env:
+            return f"v{slot}", self.env[slot]
+        value_type = self.types.get(id(expression_node))
+        if value_type is not None:
+            if slot in self.assigned:
+                self.guards.append((slot, value_type))
+            else:
+                self.entry_guards[slot] = value_type
+            self.env[slot] = value_type
+            return f"v{slot}", value_type
+        # never read while recording, so check it's defined like the tree walker would
+        self.env[slot] = None
+        return f"(v{slot} if v{slot} is not None else _undefined({var_name!r}))", None
@@ -0,0 +1,484 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Transpiler backend (engine="python"): turns the whole program into python source once, compile()s it, and runs
+# that. Every Brewin func becomes a python function f<index>, and every frame slot (see resolver.py) becomes a
+# local v<slot>, so block scoping/shadowing comes straight from the resolver. Callees only get their args, so they
+# can't see the caller's variables.
+#
+# Behavior (output, errors and the odd return rules) must match the tree walker in interpreterv2 exactly:
+#   - a `return x;` or a bare call whose value is nil keeps going, anything else returns it. `return;` returns nil
+#   - && and || evaluate both sides, / is integer division, == and != on different types are false/true
+#   - every error goes through InterpreterBase.error with the same message, at the same point
+#   - print evaluates its non-bool args twice (only matters if the arg makes a call)
+# Operators marked 'typed' (typeinfer.py) are plain python operators, the rest call the _add/_lt/... helpers
+# below, which do the type checks. Counting loops (loops.py) are python for loops over a range, hoisted
+# expressions (licm.py) and inlined calls (inliner.py) use := to fill in their slots.
+#
+# Tail calls (tailcalls.py): a func calling itself in tail position becomes a `while True:` loop around its body.
+# A tail call to some other func returns a _TailCall instead, and calls to funcs that can do that go through
+# _trampoline, so mutual tail recursion doesn't grow the python stack either.
+#
+# Compiled code objects are cached by a hash of the Brewin source (plus the options that change the generated
+# code), so running the same program again skips parsing, the passes and codegen (see Interpreter.run).
+
+import hashlib
+
+from intbase import InterpreterBase, ErrorType
+from inliner import INLINE_NODE
+from licm import HOISTED_NODE
+from memo import LRUCache, MISSING
+
+# (source hash, options) -> (code object, name of the main function)
+CODE_CACHE = LRUCache(64)
+
+TYPED_OPERATORS = {
+    '+': '+', '-': '-', '*': '*', '/': '//', '<': '<', '<=': '<=', '>': '>', '>=': '>=', '==': '==', '!=': '!=',
+    '&&': '&', '||': '|',
+}
+HELPERS = {
+    '+': '_add', '-': '_sub', '*': '_mul', '/': '_div', '<': '_lt', '<=': '_le', '>': '_gt', '>=': '_ge',
+    '==': '_eq', '!=': '_ne', '&&': '_and', '||': '_or',
+    InterpreterBase.NEG_NODE: '_neg', InterpreterBase.NOT_NODE: '_not',
+}
+# these always give a bool (or error), so an if/for doesn't need to check
+BOOL_KINDS = ('<', '<=', '>', '>=', '==', '!=', '&&', '||', InterpreterBase.NOT_NODE)
+
+
+def cache_key(program, options):
+    return (hashlib.sha256(program.encode()).hexdigest(), options)
+
+
+class PythonTranspiler:
+    def __init__(self, interpreter):
+        self.interp = interpreter
+        # func node -> python function name
+        self.names = {}
+        # funcs that can give back a _TailCall (they tail call some other func)
+        self.trampolined = set()
+        # per function being generated
+        self.func = None
+        self.lines = []
+        self.depth = 0
+        self.never_none = set()
+        self.ranges = 0
+
+    # returns (python source, name of main's function)
+    def transpile_program(self, func_defs, main_func_node):
+        for index, func in enumerate(func_defs):
+            self.names[func] = f"f{index}"
+        for func in func_defs:
+            if any(call.dict.get('tail_call') and self.get_callee(call) is not func for call in tail_calls(func)):
+                self.trampolined.add(func)
+        self.lines = []
+        for func in func_defs:
+            self.transpile_func(func)
+        return "\n".join(self.lines) + "\n", self.names[main_func_node]
+
+    def emit(self, line):
+        self.lines.append("    " * self.depth + line)
+
+    def get_callee(self, call_node):
+        return self.interp.func_table.get((call_node.dict['name'], len(call_node.dict['args'])))
+
+    def transpile_func(self, func_node):
+        self.func = func_node
+        params = [f"v{slot}" for slot in range(len(func_node.dict['args']))]
+        # params always hold a value (the resolver never gives their slots to anything else),
+        # anything else might be declared but not defined
+        self.never_none = set(range(len(params)))
+        self.ranges = 0
+        self.emit(f"def {self.names[func_node]}({', '.join(params)}):  # {func_node.dict['name']}")
+        self.depth += 1
+        others = [f"v{slot}" for slot in range(len(params), func_node.dict['frame_size'])]
+        if others:
+            self.emit(" = ".join(others) + " = None")
+        loops = any(call.dict.get('tail_call') and self.get_callee(call) is func_node for call in tail_calls(func_node))
+        if loops:
+            # calls to ourself in tail position just start over with new params
+            self.emit("while True:")
+            self.depth += 1
+        self.transpile_block(func_node.dict['statements'])
+        self.emit("return nil")
+        self.depth -= 2 if loops else 1
+        self.emit("")
+
+    def transpile_block(self, statements):
+        start = len(self.lines)
+        for statement in statements or ():
+            self.transpile_statement(statement)
+        if len(self.lines) == start:
+            self.emit("pass")
+
+    ### STATEMENTS ###
+
+    def transpile_statement(self, statement_node):
+        kind = statement_node.elem_type
+        if kind == InterpreterBase.VAR_DEF_NODE:
+            slot = statement_node.dict['slot']
+            if slot is None:
+                self.emit_error(ErrorType.NAME_ERROR, f"Variable {statement_node.dict['name']} defined more than once")
+            else:
+                self.emit(f"v{slot} = None")
+        elif kind == "=":
+            slot = statement_node.dict['slot']
+            # variable has to exist before the expression gets evaluated
+            if slot is None:
+                self.emit_error(ErrorType.NAME_ERROR, f"variable used and not declared: {statement_node.dict['name']}")
+            else:
+                self.emit(f"v{slot} = {self.transpile_expression(statement_node.dict['expression'])}")
+        elif kind == InterpreterBase.FCALL_NODE:
+            if statement_node.dict['name'] == "print":
+                # always nil, never ends the function
+                self.emit(self.transpile_expression(statement_node))
+            else:
+                self.transpile_result(statement_node)
+        elif kind == InterpreterBase.RETURN_NODE:
+            expression = statement_node.dict['expression']
+            if expression is None:
+                self.emit("return nil")
+            elif expression.elem_type in (InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE,
+                                          InterpreterBase.BOOL_NODE):
+                self.emit(f"return {self.transpile_expression(expression)}")
+            elif expression.elem_type != InterpreterBase.NIL_NODE:
+                self.transpile_result(expression)
+        elif kind == InterpreterBase.IF_NODE:
+            self.emit(f"if {self.transpile_condition(statement_node.dict['condition'])}:")
+            self.depth += 1
+            self.transpile_block(statement_node.dict['statements'])
+            self.depth -= 1
+            if statement_node.dict['else_statements']:
+                self.emit("else:")
+                self.depth += 1
+                self.transpile_block(statement_node.dict['else_statements'])
+                self.depth -= 1
+        elif kind == InterpreterBase.FOR_NODE:
+            self.transpile_for_loop(statement_node)
+        # anything else is ignored by the tree walker
+
+    # value of a return/call statement: the function ends unless it's nil
+    def transpile_result(self, expression_node):
+        if expression_node.elem_type == InterpreterBase.FCALL_NODE and expression_node.dict.get('tail_call'):
+            callee = self.get_callee(expression_node)
+            args = [self.transpile_expression(arg) for arg in expression_node.dict['args']]
+            if callee is self.func:
+                # args all get evaluated before any param changes
+                if args:
+                    params = [f"v{slot}" for slot in range(len(args))]
+                    self.emit(f"{', '.join(params)} = {', '.join(args)}")
+                self.emit("continue")
+            else:
+                self.emit(f"return _TailCall({', '.join([self.names[callee]] + args)})")
+            return
+        self.emit(f"_r = {self.transpile_expression(expression_node)}")
+        self.emit("if _r is not nil:")
+        self.emit("    return _r")
+
+    # python expression for an if/for condition, errors if it isn't a bool
+    def transpile_condition(self, condition_node):
+        condition = self.transpile_expression(condition_node)
+        if condition_node.elem_type in BOOL_KINDS or condition_node.elem_type == InterpreterBase.BOOL_NODE:
+            return condition
+        return f"_condition({condition})"
+
+    def transpile_for_loop(self, statement_node):
+        # hoisted expressions (licm.py) get computed again every time the loop starts
+        for slot in statement_node.dict.get('temps', ()):
+            self.emit(f"v{slot} = None")
+        self.transpile_statement(statement_node.dict['init'])
+        condition = statement_node.dict['condition']
+        counter = statement_node.dict.get('counter')
+        if counter is not None:
+            self.transpile_counting_loop(statement_node, counter)
+            return
+        # condition is evaluated exactly once per iteration, and has to be a bool
+        self.emit(f"while {self.transpile_condition(condition)}:")
+        self.depth += 1
+        self.transpile_block(statement_node.dict['statements'])
+        self.transpile_statement(statement_node.dict['update'])
+        self.depth -= 1
+
+    # for (i = a; i < b; i = i + k) loops marked by loops.py. if i or b isn't an int the condition would
+    # error the first time it's checked, so that's all the slow path has to do
+    def transpile_counting_loop(self, statement_node, counter):
+        slot, comparison, step = counter
+        condition = statement_node.dict['condition']
+        self.ranges += 1
+        bound = f"_b{self.ranges}"
+        values = f"_range{self.ranges}"
+        self.emit(f"{bound} = {self.transpile_expression(condition.dict['op2'])}")
+        self.emit(f"if type(v{slot}) is not int or type({bound}) is not int:")
+        self.emit(f"    {HELPERS[comparison]}(v{slot}, {bound})")
+        if comparison == '<=':
+            end = f"{bound} + 1"
+        elif comparison == '>=':
+            end = f"{bound} - 1"
+        else:
+            end = bound
+        self.emit(f"{values} = range(v{slot}, {end}, {step})")
+        self.emit(f"for v{slot} in {values}:")
+        self.depth += 1
+        self.transpile_block(statement_node.dict['statements'])
+        self.depth -= 1
+        # i ends up one step past the last value, same as after the last update
+        self.emit(f"if {values}:")
+        self.emit(f"    v{slot} = {values}[-1] + {step}")
+
+    def emit_error(self, error_type, message):
+        self.emit(self.error_expression(error_type, message))
+
+    def error_expression(self, error_type, message):
+        return f"_error({error_type.name}, {message!r})"
+
+    ### EXPRESSIONS ###
+
+    def transpile_expression(self, expression_node):
+        kind = expression_node.elem_type
+        if kind in (InterpreterBase.INT_NODE, InterpreterBase.STRING_NODE, InterpreterBase.BOOL_NODE):
+            return repr(expression_node.dict['val'])
+        if kind == InterpreterBase.NIL_NODE:
+            return "nil"
+        if kind == InterpreterBase.VAR_NODE:
+            return self.transpile_variable(expression_node)
+        if kind == InterpreterBase.FCALL_NODE:
+            return self.transpile_func_call(expression_node)
+        if kind == INLINE_NODE:
+            # args go into their slots (left to right), then the func's expression runs
+            parts = []
+            for slot, arg in zip(expression_node.dict['slots'], expression_node.dict['args']):
+                parts.append(f"(v{slot} := {self.transpile_expression(arg)})")
+            # the expression can only see the params, which were just set (the slots get reused after though)
+            saved_never_none = self.never_none
+            self.never_none = set(expression_node.dict['slots'])
+            parts.append(self.transpile_expression(expression_node.dict['expression']))
+            self.never_none = saved_never_none
+            if len(parts) == 1:
+                return parts[0]
+            return f"({', '.join(parts)})[-1]"
+        if kind == HOISTED_NODE:
+            # computed the first time the loop gets here, then reused
+            slot = expression_node.dict['slot']
+            expression = self.transpile_expression(expression_node.dict['expression'])
+            return f"(v{slot} if v{slot} is not None else (v{slot} := {expression}))"
+        if kind not in HELPERS:
+            # evaluate_expression returns None for anything it doesn't know
+            return "None"
+
+        op1 = self.transpile_expression(expression_node.dict['op1'])
+        if 'op2' not in expression_node.dict:
+            if 'typed' in expression_node.dict:
+                return f"(-{op1})" if kind == InterpreterBase.NEG_NODE else f"(not {op1})"
+            return f"{HELPERS[kind]}({op1})"
+        op2 = self.transpile_expression(expression_node.dict['op2'])
+        if 'typed' in expression_node.dict:
+            return f"({op1} {TYPED_OPERATORS[kind]} {op2})"
+        return f"{HELPERS[kind]}({op1}, {op2})"
+
+    def transpile_variable(self, expression_node):
+        var_name = expression_node.dict['name']
+        slot = expression_node.dict['slot']
+        if slot is None:
+            return self.error_expression(ErrorType.NAME_ERROR, f"variable '{var_name}' used and not declared")
+        if slot in self.never_none:
+            return f"v{slot}"
+        return f"(v{slot} if v{slot} is not None else _undefined({var_name!r}))"
+
+    def transpile_func_call(self, call_node):
+        func_call = call_node.dict['name']
+        args = call_node.dict['args']
+        if func_call == "print":
+            return f"_print({', '.join(self.transpile_print_arg(arg) for arg in args)})"
+        if func_call == "inputi" or func_call == "inputs":
+            if len(args) > 1:
+                return self.error_expression(ErrorType.NAME_ERROR,
+                                             f"No {func_call}() function found that takes > 1 parameter")
+            if args:
+                return f"_input_prompt({self.transpile_expression(args[0])})"
+            return "_input()"
+        if not self.interp.check_valid_func(func_call):
+            return self.error_expression(ErrorType.NAME_ERROR, f"Function {func_call} was not found")
+        callee = self.get_callee(call_node)
+        if callee is None:
+            return self.error_expression(ErrorType.NAME_ERROR, f"Incorrect amount of arguments given: {len(args)} ")
+        call = f"{self.names[callee]}({', '.join(self.transpile_expression(arg) for arg in args)})"
+        if callee in self.trampolined:
+            return f"_trampoline({call})"
+        return call
+
+    # string for one print arg. the tree walker evaluates non-bool args a second time, which only
+    # makes a difference if the arg calls something
+    def transpile_print_arg(self, arg):
+        value = self.transpile_expression(arg)
+        if not makes_calls(arg):
+            return f"_to_str({value})"
+        return f"(('true' if _p else 'false') if type(_p := {value}) is bool else str({value}))"
+
+
+# tail call nodes anywhere tailcalls.py could have marked them
+def tail_calls(func_node):
+    calls = []
+    find_tail_calls(func_node.dict['statements'], calls)
+    return calls
+
+
+def find_tail_calls(statements, calls):
+    for statement in statements or ():
+        if statement.elem_type == InterpreterBase.IF_NODE:
+            find_tail_calls(statement.dict['statements'], calls)
+            find_tail_calls(statement.dict['else_statements'], calls)
+        elif statement.elem_type == InterpreterBase.FCALL_NODE:
+            calls.append(statement)
+        elif statement.elem_type == InterpreterBase.RETURN_NODE and statement.dict['expression'] is not None:
+            if statement.dict['expression'].elem_type == InterpreterBase.FCALL_NODE:
+                calls.append(statement.dict['expression'])
+
+
+def makes_calls(expression_node):
+    if expression_node.elem_type == InterpreterBase.FCALL_NODE:
+        return True
+    for key in ('op1', 'op2', 'expression'):
+        if key in expression_node.dict and makes_calls(expression_node.dict[key]):
+            return True
+    return any(makes_calls(arg) for arg in expression_node.dict.get('args', ()))
+
+
+class _TailCall:
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+
+# globals the generated code runs with. the checks/messages are the same as the tree walker's
+def make_runtime(interp, nil):
+    error = interp.error
+
+    def _undefined(var_name):
+        error(ErrorType.NAME_ERROR, f"variable '{var_name}' declared but not defined",)
+
+    def _condition(value):
+        if type(value) is not bool:
+            error(ErrorType.TYPE_ERROR, "Condition is not of type bool",)
+        return value
+
+    def _trampoline(return_value):
+        while type(return_value) is _TailCall:
+            return_value = return_value.func(*return_value.args)
+        return return_value
+
+    def _to_str(value):
+        if type(value) is bool:
+            return "true" if value else "false"
+        return str(value)
+
+    def _print(*parts):
+        interp.output("".join(parts))
+        return nil
+
+    def _input():
+        user_in = interp.get_input()
+        try:
+            return int(user_in)
+        except:
+            return user_in
+
+    def _input_prompt(prompt):
+        interp.output(prompt)
+        return _input()
+
+    def _add(eval1, eval2):
+        if not ((type(eval1) == int and type(eval2) == int) or (type(eval1) == str and type(eval2) == str)):
+            error(ErrorType.TYPE_ERROR, "Types for + must be both of type int or string.",)
+        return eval1 + eval2
+
+    def check_ints(eval1, eval2):
+        if not (type(eval1) == int and type(eval2) == int):
+            error(ErrorType.TYPE_ERROR, "Arguments must be of type 'int'.",)
+
+    def _sub(eval1, eval2):
+        check_ints(eval1, eval2)
+        return eval1 - eval2
+
+    def _mul(eval1, eval2):
+        check_ints(eval1, eval2)
+        return eval1 * eval2
+
+    def _div(eval1, eval2):
+        check_ints(eval1, eval2)
+        return eval1 // eval2
+
+    def _neg(eval):
+        if not (type(eval) == int):
+            error(ErrorType.TYPE_ERROR, "'negation' can only be used on integer values.",)
+        return -(eval)
+
+    def _not(eval):
+        if not (type(eval) == bool):
+            error(ErrorType.TYPE_ERROR, "'Not' can only be used on boolean values.",)
+        return not (eval)
+
+    def _eq(eval1, eval2):
+        return type(eval1) == type(eval2) and eval1 == eval2
+
+    def _ne(eval1, eval2):
+        return type(eval1) != type(eval2) or eval1 != eval2
+
+    def check_bools(kind, eval1, eval2):
+        if (type(eval1) is not bool) or (type(eval2) is not bool):
+            error(ErrorType.TYPE_ERROR, f"Comparison args for {kind} must be of same type bool.",)
+
+    def _and(eval1, eval2):
+        check_bools('&&', eval1, eval2)
+        return eval1 and eval2
+
+    def _or(eval1, eval2):
+        check_bools('||', eval1, eval2)
+        return eval1 or eval2
+
+    def check_comparison(kind, eval1, eval2):
+        if not (type(eval1) == int and type(eval2) == int):
+            error(ErrorType.TYPE_ERROR, f"Comparison args for {kind} must be of same type int.",)
+
+    def _lt(eval1, eval2):
+        check_comparison('<', eval1, eval2)
+        return eval1 < eval2
+
+    def _le(eval1, eval2):
+        check_comparison('<=', eval1, eval2)
+        return eval1 <= eval2
+
+    def _gt(eval1, eval2):
+        check_comparison('>', eval1, eval2)
+        return eval1 > eval2
+
+    def _ge(eval1, eval2):
+        check_comparison('>=', eval1, eval2)
+        return eval1 >= eval2
+
+    return {
+        'nil': nil, 'NAME_ERROR': ErrorType.NAME_ERROR, 'TYPE_ERROR': ErrorType.TYPE_ERROR,
+        '_error': error, '_undefined': _undefined, '_condition': _condition,
+        '_TailCall': _TailCall, '_trampoline': _trampoline,
+        '_to_str': _to_str, '_print': _print, '_input': _input, '_input_prompt': _input_prompt,
+        '_add': _add, '_sub': _sub, '_mul': _mul, '_div': _div, '_neg': _neg, '_not': _not,
+        '_eq': _eq, '_ne': _ne, '_and': _and, '_or': _or, '_lt': _lt, '_le': _le, '_gt': _gt, '_ge': _ge,
+    }
+
+
+# compiles (or gets from CODE_CACHE, unless key is None) and runs the program. get_ast is only called when
+# there's nothing cached: it runs the parser and all the passes and returns main's func node
+def run_transpiled(interp, nil, key, get_ast):
+    cached = MISSING if key is None else CODE_CACHE.get(key)
+    if cached is MISSING:
+        main_func_node = get_ast()
+        transpiler = PythonTranspiler(interp)
+        source, main_name = transpiler.transpile_program(interp.func_defs, main_func_node)
+        cached = (compile(source, "<brewin>", "exec"), main_name)
+        interp.python_source = source
+        if key is not None:
+            CODE_CACHE.put(key, cached)
+    code, main_name = cached
+    runtime = make_runtime(interp, nil)
+    exec(code, runtime)
+    return runtime['_trampoline'](runtime[main_name]())
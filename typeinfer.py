@@ -0,0 +1,290 @@
+# Author: Shelby Falde
+# Course: CS131
+
+# Static type inference: works out which operators always get operands of the right type, so the engines can
+# skip the type checks for them. Needs resolver.py to have run (types are tracked per slot).
+#
+# It's flow-sensitive: walks each func body keeping the type of every slot at that point. Assignments set the
+# slot's type, if/else branches get merged (same type on both sides or unknown), and for loops are re-run until
+# the types at the top of the loop stop changing.
+# Param types come from every call site (the join of all args passed in), and return types from every way a func
+# can return. Both are iterated over the whole program until nothing changes, so recursion works too.
+#
+# var_type/return_type annotations aren't used: this version of Brewin doesn't enforce them at runtime
+# (`func f(a: int)` still takes a string), so trusting them could skip a check that should fail.
+# The call site / return analysis above gets the same types for programs that are annotated correctly.
+#
+# Operators whose operand types are known to pass the checks get 'typed': True. The engines then just apply
+# OPERATORS[kind] to the operand values.
+
+import operator
+
+from intbase import InterpreterBase
+from inliner import INLINE_NODE
+from licm import HOISTED_NODE
+
+INT = "int"
+STRING = "string"
+BOOL = "bool"
+NIL = "nil"
+# nothing has been stored yet, or the expression never finishes (e.g. it reads an undefined variable,
+# or calls a func that never returns). Code after something that never finishes can't be reached.
+NOTHING = "nothing"
+# None means the type isn't known
+
+# what the engines run for a 'typed' operator
+OPERATORS = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.floordiv,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    '==': operator.eq, '!=': operator.ne, '&&': operator.and_, '||': operator.or_,
+    InterpreterBase.NEG_NODE: operator.neg, InterpreterBase.NOT_NODE: operator.not_,
+}
+
+LITERAL_TYPES = {
+    InterpreterBase.INT_NODE: INT, InterpreterBase.STRING_NODE: STRING,
+    InterpreterBase.BOOL_NODE: BOOL, InterpreterBase.NIL_NODE: NIL,
+}
+
+# most times the whole program gets re-analyzed before giving up (and marking nothing)
+MAX_PASSES = 50
+
+
+def join(type1, type2):
+    if type1 == NOTHING:
+        return type2
+    if type2 == NOTHING or type1 == type2:
+        return type1
+    return None
+
+
+# a state is a list with the type of every slot, or None if that point can't be reached
+def join_states(state1, state2):
+    if state1 is None:
+        return state2
+    if state2 is None:
+        return state1
+    return [join(type1, type2) for type1, type2 in zip(state1, state2)]
+
+
+class TypeInference:
+    def __init__(self, func_table):
+        self.func_table = func_table
+        # func node -> list of param types / return type, from the last pass
+        self.param_types = {}
+        self.return_types = {}
+        # same thing, being built by the current pass
+        self.next_param_types = {}
+        self.next_return_types = {}
+        self.func = None
+        # only the last pass (with everything settled) writes 'typed' marks
+        self.marking = False
+        self.count = 0
+
+    def infer_program(self, ast):
+        functions = ast.dict['functions']
+        for func in functions:
+            self.param_types[func] = [NOTHING] * len(func.dict['args'])
+            self.return_types[func] = NOTHING
+
+        for _ in range(MAX_PASSES):
+            self.run_pass(functions)
+            if self.next_param_types == self.param_types and self.next_return_types == self.return_types:
+                self.marking = True
+                self.run_pass(functions)
+                return self.count
+            self.param_types = self.next_param_types
+            self.return_types = self.next_return_types
+        return 0
+
+    def run_pass(self, functions):
+        self.next_param_types = {}
+        self.next_return_types = {}
+        for func in functions:
+            self.next_param_types[func] = [NOTHING] * len(func.dict['args'])
+            self.next_return_types[func] = NOTHING
+        for func in functions:
+            self.infer_func(func)
+
+    def infer_func(self, func_node):
+        self.func = func_node
+        state = [NOTHING] * func_node.dict['frame_size']
+        state[:len(func_node.dict['args'])] = self.param_types[func_node]
+        state = self.infer_block(func_node.dict['statements'], state)
+        # falling off the end returns nil
+        if state is not None:
+            self.add_return(NIL)
+
+    def add_return(self, value_type):
+        self.next_return_types[self.func] = join(self.next_return_types[self.func], value_type)
+
+    def mark(self, expression_node, typed):
+        if not self.marking:
+            return
+        if typed:
+            expression_node.dict['typed'] = True
+            self.count += 1
+        else:
+            expression_node.dict.pop('typed', None)
+
+    # returns the state after the block (may change the one passed in)
+    def infer_block(self, statements, state):
+        for statement in statements or ():
+            if state is None:
+                break
+            state = self.infer_statement(statement, state)
+        return state
+
+    def infer_statement(self, statement_node, state):
+        kind = statement_node.elem_type
+        if kind == InterpreterBase.VAR_DEF_NODE:
+            if statement_node.dict['slot'] is not None:
+                state[statement_node.dict['slot']] = NOTHING
+            return state
+        if kind == "=":
+            value_type = self.infer_expression(statement_node.dict['expression'], state)
+            if value_type == NOTHING:
+                return None
+            if statement_node.dict['slot'] is not None:
+                state[statement_node.dict['slot']] = value_type
+            return state
+        if kind == InterpreterBase.FCALL_NODE or kind == InterpreterBase.RETURN_NODE:
+            # both end the function with their value, unless it's nil
+            if kind == InterpreterBase.RETURN_NODE and statement_node.dict['expression'] is None:
+                self.add_return(NIL)
+                return None
+            if kind == InterpreterBase.RETURN_NODE:
+                value_type = self.infer_expression(statement_node.dict['expression'], state)
+            else:
+                value_type = self.infer_expression(statement_node, state)
+            if value_type == NOTHING:
+                return None
+            if value_type == NIL:
+                return state
+            self.add_return(value_type)
+            # might be nil, so it might keep going
+            if value_type is None:
+                return state
+            return None
+        if kind == InterpreterBase.IF_NODE:
+            if self.infer_expression(statement_node.dict['condition'], state) == NOTHING:
+                return None
+            then_state = self.infer_block(statement_node.dict['statements'], list(state))
+            else_state = self.infer_block(statement_node.dict['else_statements'], list(state))
+            return join_states(then_state, else_state)
+        if kind == InterpreterBase.FOR_NODE:
+            return self.infer_for_loop(statement_node, state)
+        return state
+
+    def infer_for_loop(self, for_node, state):
+        state = self.infer_statement(for_node.dict['init'], state)
+        if state is None:
+            return None
+        # find the types at the top of the loop first (without marking anything), then do the real pass
+        marking = self.marking
+        self.marking = False
+        top = state
+        while True:
+            new_top = join_states(top, self.infer_loop_body(for_node, top)[1])
+            if new_top == top:
+                break
+            top = new_top
+        self.marking = marking
+        condition_type, _ = self.infer_loop_body(for_node, top)
+        # the loop exits when the condition is false, at the top
+        if condition_type == NOTHING:
+            return None
+        return top
+
+    # one time around the loop starting from top, returns (condition type, state after the update)
+    def infer_loop_body(self, for_node, top):
+        condition_type = self.infer_expression(for_node.dict['condition'], top)
+        if condition_type == NOTHING:
+            return condition_type, None
+        state = self.infer_block(for_node.dict['statements'], list(top))
+        if state is not None:
+            state = self.infer_statement(for_node.dict['update'], state)
+        return condition_type, state
+
+    def infer_expression(self, expression_node, state):
+        kind = expression_node.elem_type
+        if kind in LITERAL_TYPES:
+            return LITERAL_TYPES[kind]
+        if kind == InterpreterBase.VAR_NODE:
+            slot = expression_node.dict['slot']
+            return NOTHING if slot is None else state[slot]
+        if kind == InterpreterBase.FCALL_NODE:
+            return self.infer_func_call(expression_node, state)
+        if kind == INLINE_NODE:
+            return self.infer_inline(expression_node, state)
+        if kind == HOISTED_NODE:
+            return self.infer_expression(expression_node.dict['expression'], state)
+        if kind not in OPERATORS:
+            return None
+
+        type1 = self.infer_expression(expression_node.dict['op1'], state)
+        if 'op2' in expression_node.dict:
+            type2 = self.infer_expression(expression_node.dict['op2'], state)
+        else:
+            type2 = None
+        # an operand that never finishes means neither does the operator
+        if type1 == NOTHING or type2 == NOTHING:
+            self.mark(expression_node, False)
+            return NOTHING
+        if kind == InterpreterBase.NEG_NODE:
+            self.mark(expression_node, type1 == INT)
+            return INT
+        if kind == InterpreterBase.NOT_NODE:
+            self.mark(expression_node, type1 == BOOL)
+            return BOOL
+        if kind == '+':
+            self.mark(expression_node, type1 == type2 and type1 in (INT, STRING))
+            # if it doesn't error, both sides are whatever type we know one side is
+            if type1 in (INT, STRING):
+                return type1
+            if type2 in (INT, STRING):
+                return type2
+            return None
+        if kind in ('-', '*', '/'):
+            self.mark(expression_node, type1 == INT and type2 == INT)
+            return INT
+        if kind in ('==', '!='):
+            self.mark(expression_node, type1 == type2 and type1 is not None)
+            return BOOL
+        if kind in ('&&', '||'):
+            self.mark(expression_node, type1 == BOOL and type2 == BOOL)
+            return BOOL
+        self.mark(expression_node, type1 == INT and type2 == INT)
+        return BOOL
+
+    def infer_func_call(self, call_node, state):
+        arg_types = [self.infer_expression(arg, state) for arg in call_node.dict['args']]
+        if NOTHING in arg_types:
+            return NOTHING
+        func_call = call_node.dict['name']
+        if func_call == "print":
+            return NIL
+        if func_call == "inputi" or func_call == "inputs":
+            # int if the input looks like one, string otherwise
+            return None
+        func = self.func_table.get((func_call, len(arg_types)))
+        if func is None:
+            # NAME_ERROR
+            return NOTHING
+        params = self.next_param_types[func]
+        for i in range(len(params)):
+            params[i] = join(params[i], arg_types[i])
+        return self.return_types[func]
+
+    # inlined call (see inliner.py): the args' types go into the param slots, then it's the expression's type
+    def infer_inline(self, inline_node, state):
+        arg_types = [self.infer_expression(arg, state) for arg in inline_node.dict['args']]
+        if NOTHING in arg_types:
+            return NOTHING
+        for slot, arg_type in zip(inline_node.dict['slots'], arg_types):
+            state[slot] = arg_type
+        return self.infer_expression(inline_node.dict['expression'], state)
+
+
+# exported function, returns how many operators were marked 'typed'
+def infer_types(ast, func_table):
+    return TypeInference(func_table).infer_program(ast)